@@ -1,16 +1,96 @@
 import os
-import requests
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+import contextvars
+import json
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_template
 from dotenv import load_dotenv
 
+from gitlab_client import GitLabClient, pagination_deadline
+from gitlab_graphql import GitLabGraphQL
+from identity_cache import IdentityCache
+import metrics
+from metrics import decode_json
+from org_index import OrgCrawler, OrgIndex
+from records import GroupRecord, ProjectRecord
+from repo_snapshot import BlobStore, RepositorySnapshotter
+from response_cache import WEBHOOK_TTLS, ResponseCache, token_fingerprint
+from stream_render import ChunkedStream, PageFeed
+from tree_index import TreeIndexer
+import webhooks
+from webhooks import WebhookInvalidator
+
 # Load environment variables (for API token)
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.getenv("SECRET_KEY", "development-secret-key")
 
-# GitLab API base URL
-GITLAB_API_URL = "https://gitlab.com/api/v4"
+# GitLab API base URL (override to point at a self-hosted instance or mock_gitlab.py)
+GITLAB_API_URL = os.getenv("GITLAB_API_URL", "https://gitlab.com/api/v4")
+
+# Data backend for the dashboard and group pages: "rest" or "graphql".
+# The GraphQL backend falls back to REST whenever a query fails.
+GITLAB_BACKEND = os.getenv("GITLAB_BACKEND", "rest").lower()
+
+# Seconds a route waits on its upstream calls before rendering partial data
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "8"))
+
+# Upper bound on list items a single page renders
+LIST_LIMIT = int(os.getenv("LIST_LIMIT", "1000"))
+
+# Stream the dashboard: the page shell is sent at once and the project and
+# group lists follow page by page, with no LIST_LIMIT
+STREAM_DASHBOARD = os.getenv("STREAM_DASHBOARD", "").lower() in ("1", "true", "yes")
+
+# Secret GitLab sends in X-Gitlab-Token; the webhook endpoint is disabled without it
+GITLAB_WEBHOOK_SECRET = os.getenv("GITLAB_WEBHOOK_SECRET")
+
+# Shared response cache; CACHE_TTLS is a JSON object of path pattern -> seconds.
+# With webhooks configured, invalidation keeps long-lived entries correct.
+if os.getenv("CACHE_TTLS"):
+    cache_ttls = json.loads(os.environ["CACHE_TTLS"])
+elif GITLAB_WEBHOOK_SECRET:
+    cache_ttls = WEBHOOK_TTLS
+else:
+    cache_ttls = None
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "2048")),
+    ttls=cache_ttls
+)
+
+# Pooled client shared by every helper so connections are reused
+gitlab = GitLabClient(GITLAB_API_URL, timeout=UPSTREAM_TIMEOUT, cache=response_cache)
+gitlab.on_call(metrics.record_upstream)
+
+# /metrics, Server-Timing headers and the opt-in slow-request profiler
+metrics.init_app(
+    app,
+    cache=response_cache,
+    profile_threshold_ms=float(os.environ["PROFILE_SLOW_MS"]) if os.getenv("PROFILE_SLOW_MS") else None,
+    profile_sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0.1")),
+    profile_dir=os.getenv("PROFILE_DIR", "profiles")
+)
+
+# Single-round-trip loader used when GITLAB_BACKEND is "graphql"
+graphql = GitLabGraphQL(gitlab)
+
+# Repository tree indexes, built once per commit SHA
+tree_indexer = TreeIndexer(gitlab)
+
+# Content-addressed store for snapshot file contents, shared across snapshots
+snapshotter = RepositorySnapshotter(
+    gitlab,
+    tree_indexer,
+    BlobStore(os.getenv("SNAPSHOT_DIR", os.path.join(tempfile.gettempdir(), "gitlab-snapshots")))
+)
+
+# Bounded pool used to issue a route's independent GitLab calls in parallel
+upstream_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("UPSTREAM_WORKERS", "16")),
+    thread_name_prefix='gitlab-upstream'
+)
 
 def get_gitlab_headers(token):
     """Return headers for GitLab API requests with authorization."""
@@ -21,68 +101,165 @@ def get_gitlab_headers(token):
 
 def get_user_info(token):
     """Get current user information from GitLab."""
-    response = requests.get(
-        f"{GITLAB_API_URL}/user",
+    response = gitlab.get(
+        "/user",
         headers=get_gitlab_headers(token)
     )
     if response.status_code == 200:
-        return response.json()
+        return decode_json(response)
     return None
 
 def get_projects(token, page=1, per_page=20):
     """Get projects the user has access to."""
-    response = requests.get(
-        f"{GITLAB_API_URL}/projects", 
+    response = gitlab.get(
+        "/projects", 
         headers=get_gitlab_headers(token),
-        params={'page': page, 'per_page': per_page, 'membership': True}
+        params={'page': page, 'per_page': per_page, 'membership': True, 'simple': True}
     )
     if response.status_code == 200:
-        return response.json()
+        return decode_json(response, ProjectRecord.decode)
     return []
 
+def iter_projects(token, limit=None):
+    """Yield every project the user is a member of, using keyset pagination."""
+    return gitlab.paginate(
+        "/projects",
+        headers=get_gitlab_headers(token),
+        params={'membership': True, 'simple': True},
+        limit=limit,
+        keyset=True,
+        decoder=ProjectRecord.decode
+    )
+
 def get_project_details(token, project_id):
     """Get detailed information about a specific project."""
-    response = requests.get(
-        f"{GITLAB_API_URL}/projects/{project_id}",
+    response = gitlab.get(
+        f"/projects/{project_id}",
         headers=get_gitlab_headers(token)
     )
     if response.status_code == 200:
-        return response.json()
+        return decode_json(response, ProjectRecord.decode)
     return None
 
-def get_project_files(token, project_id, path="", ref="main"):
+def get_project_tree(token, project_id, ref=None):
+    """Get the full recursive tree index of a project at a ref (default branch if None)."""
+    return tree_indexer.get_index(project_id, ref, headers=get_gitlab_headers(token))
+
+def get_project_files(token, project_id, path="", ref=None):
     """Get files and directories within a project."""
-    response = requests.get(
-        f"{GITLAB_API_URL}/projects/{project_id}/repository/tree",
-        headers=get_gitlab_headers(token),
-        params={'path': path, 'ref': ref}
-    )
-    if response.status_code == 200:
-        return response.json()
-    return []
+    index = get_project_tree(token, project_id, ref)
+    if index is None:
+        return []
+    return index.entries(path)
+
+def get_project_snapshot(token, project_id, ref=None, **filters):
+    """Get a {path: blob_id} manifest of a project's source files, stored in snapshotter.store."""
+    return snapshotter.snapshot(project_id, ref, headers=get_gitlab_headers(token), **filters)
 
 def get_groups(token, page=1, per_page=20):
     """Get groups the user is a member of."""
-    response = requests.get(
-        f"{GITLAB_API_URL}/groups",
+    response = gitlab.get(
+        "/groups",
         headers=get_gitlab_headers(token),
         params={'page': page, 'per_page': per_page}
     )
     if response.status_code == 200:
-        return response.json()
+        return decode_json(response, GroupRecord.decode)
     return []
 
+def iter_groups(token, limit=None):
+    """Yield every group the user is a member of."""
+    return gitlab.paginate(
+        "/groups",
+        headers=get_gitlab_headers(token),
+        limit=limit,
+        decoder=GroupRecord.decode
+    )
+
 def get_group_projects(token, group_id, page=1, per_page=20):
     """Get projects within a specific group."""
-    response = requests.get(
-        f"{GITLAB_API_URL}/groups/{group_id}/projects",
+    response = gitlab.get(
+        f"/groups/{group_id}/projects",
         headers=get_gitlab_headers(token),
-        params={'page': page, 'per_page': per_page}
+        params={'page': page, 'per_page': per_page, 'simple': True}
     )
     if response.status_code == 200:
-        return response.json()
+        return decode_json(response, ProjectRecord.decode)
     return []
 
+def iter_group_projects(token, group_id, limit=None):
+    """Yield every project in a group, fetching known page ranges concurrently."""
+    return gitlab.paginate_parallel(
+        f"/groups/{group_id}/projects",
+        headers=get_gitlab_headers(token),
+        params={'simple': True},
+        limit=limit,
+        decoder=ProjectRecord.decode
+    )
+
+# Verified identities; a 401 from any upstream call drops the token's entry
+identity_cache = IdentityCache(
+    get_user_info,
+    upstream_executor,
+    revalidate_after=float(os.getenv("IDENTITY_REVALIDATE_SECONDS", "300"))
+)
+gitlab.on_unauthorized(identity_cache.invalidate_headers)
+
+# Optional local inventory of every group and project each user can reach,
+# crawled in the background; set ORG_INDEX_PATH to a SQLite file to enable it
+org_index = None
+org_crawler = None
+if os.getenv("ORG_INDEX_PATH"):
+    org_index = OrgIndex(os.environ["ORG_INDEX_PATH"])
+    # Crawls bypass the response cache so they do not evict page data,
+    # but share the rate-limit budget with everything else
+    crawl_client = GitLabClient(GITLAB_API_URL, timeout=UPSTREAM_TIMEOUT)
+    crawl_client.rate_limiter = gitlab.rate_limiter
+    crawl_client.on_call(metrics.record_upstream)
+    org_crawler = OrgCrawler(
+        crawl_client,
+        org_index,
+        max_workers=int(os.getenv("ORG_CRAWL_WORKERS", "4")),
+        recrawl_after=float(os.getenv("ORG_RECRAWL_SECONDS", "900")),
+        full_recrawl_after=float(os.getenv("ORG_FULL_RECRAWL_SECONDS", "86400"))
+    )
+
+# Drops cached data as GitLab reports changes to it
+webhook_invalidator = WebhookInvalidator(response_cache, tree_indexer, identity_cache, org_index)
+
+def fetch_concurrently(calls, timeout=UPSTREAM_TIMEOUT):
+    """Run independent upstream calls in parallel.
+
+    ``calls`` maps a name to a ``(func, args, default)`` tuple. Returns a
+    ``(results, failed)`` pair: a call that raises or does not finish within
+    ``timeout`` seconds gets its default and its name is added to ``failed``,
+    so one slow endpoint only costs its own panel.
+    """
+    deadline = time.monotonic() + timeout
+    futures = {}
+    for name, (func, args, default) in calls.items():
+        # Each call runs in a copy of the request's context so its upstream
+        # timings are attributed to this request. Running futures cannot be
+        # cancelled, so listings stop paging on their own at the deadline.
+        context = contextvars.copy_context()
+        context.run(pagination_deadline.set, deadline)
+        futures[name] = upstream_executor.submit(context.run, func, *args)
+    results = {}
+    failed = []
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(timeout=max(deadline - time.monotonic(), 0))
+        except Exception:
+            future.cancel()
+            results[name] = calls[name][2]
+            failed.append(name)
+    return results, failed
+
+def flash_failed_panels(failed):
+    """Tell the user which sections could not be loaded in time."""
+    if failed:
+        flash(f"Some data could not be loaded from GitLab: {', '.join(failed)}")
+
 @app.route('/')
 def index():
     """Main page - requires authentication."""
@@ -90,21 +267,98 @@ def index():
     if not token:
         return render_template('login.html')
 
-    user_info = get_user_info(token)
+    if GITLAB_BACKEND == 'graphql':
+        dashboard = graphql.dashboard(get_gitlab_headers(token), limit=LIST_LIMIT)
+        if dashboard is not None:
+            user_info, projects, groups = dashboard
+            identity_cache.remember(token, user_info)
+            return render_template(
+                'dashboard.html',
+                user=user_info,
+                projects=projects,
+                groups=groups
+            )
+
+    if org_crawler is not None:
+        headers = get_gitlab_headers(token)
+        org_crawler.ensure_fresh(headers)
+        if org_crawler.is_ready(headers):
+            user_info = identity_cache.get(token) or identity_cache.verify(token)
+            if user_info:
+                fingerprint = token_fingerprint(headers)
+                return render_template(
+                    'dashboard.html',
+                    user=user_info,
+                    projects=org_index.projects(fingerprint, LIST_LIMIT),
+                    groups=org_index.groups(fingerprint, LIST_LIMIT),
+                    search_enabled=True
+                )
+
+    if STREAM_DASHBOARD:
+        return stream_dashboard(token)
+
+    calls = {
+        'projects': (list, (iter_projects(token, LIST_LIMIT),), []),
+        'groups': (list, (iter_groups(token, LIST_LIMIT),), [])
+    }
+    # Only verify the token against /user when no recent verification is cached
+    if identity_cache.get(token) is None:
+        calls['user'] = (identity_cache.verify, (token,), None)
+    results, failed = fetch_concurrently(calls)
+    # Re-read so a 401 from the project or group listings counts as a failed login
+    user_info = identity_cache.get(token)
     if not user_info:
-        session.pop('gitlab_token', None)
-        flash('Authentication failed. Please enter a valid token.')
+        if 'user' in failed:
+            flash('GitLab did not respond in time. Please try again.')
+        else:
+            session.pop('gitlab_token', None)
+            flash('Authentication failed. Please enter a valid token.')
         return render_template('login.html')
 
-    projects = get_projects(token)
-    groups = get_groups(token)
-    
+    flash_failed_panels(failed)
     return render_template(
         'dashboard.html',
         user=user_info,
+        projects=results['projects'],
+        groups=results['groups'],
+        search_enabled=org_crawler is not None
+    )
+
+def stream_dashboard(token):
+    """Send the dashboard progressively: header first, then each list as its pages arrive."""
+    # The header needs the identity, and a failed login cannot be redirected
+    # once streaming has started, so verify before sending anything
+    user_info = identity_cache.get(token) or identity_cache.verify(token)
+    if not user_info:
+        session.pop('gitlab_token', None)
+        flash('Authentication failed. Please enter a valid token.')
+        return render_template('login.html')
+
+    headers = get_gitlab_headers(token)
+    projects = PageFeed(
+        gitlab.paginate("/projects", headers=headers, params={'membership': True, 'simple': True},
+                        keyset=True, strict=True, decoder=ProjectRecord.decode),
+        timeout=UPSTREAM_TIMEOUT
+    )
+    groups = PageFeed(
+        gitlab.paginate("/groups", headers=headers, strict=True, decoder=GroupRecord.decode),
+        timeout=UPSTREAM_TIMEOUT
+    )
+    stream = ChunkedStream([projects, groups])
+    body = stream_template(
+        'dashboard_stream.html',
+        user=user_info,
         projects=projects,
-        groups=groups
+        groups=groups,
+        flush_before=stream.flush_before,
+        search_enabled=org_crawler is not None
     )
+    # X-Accel-Buffering stops nginx from holding the chunks back
+    response = Response(stream.chunks(body), mimetype='text/html', headers={'X-Accel-Buffering': 'no'})
+    # chunks() closes the feeds too, but only if the body is ever iterated
+    response.call_on_close(projects.close)
+    response.call_on_close(groups.close)
+    return response
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -113,7 +367,7 @@ def login():
         token = request.form.get('gitlab_token')
         if token:
             # Verify token works
-            user_info = get_user_info(token)
+            user_info = identity_cache.verify(token)
             if user_info:
                 session['gitlab_token'] = token
                 return redirect(url_for('index'))
@@ -127,7 +381,9 @@ def login():
 @app.route('/logout')
 def logout():
     """Log out the user by removing the token."""
-    session.pop('gitlab_token', None)
+    token = session.pop('gitlab_token', None)
+    if token:
+        identity_cache.invalidate(token)
     flash('You have been logged out')
     return redirect(url_for('index'))
 
@@ -138,13 +394,22 @@ def project_detail(project_id):
     if not token:
         return redirect(url_for('login'))
     
-    project = get_project_details(token, project_id)
-    files = get_project_files(token, project_id)
-    
+    results, failed = fetch_concurrently({
+        'project': (get_project_details, (token, project_id), None),
+        'files': (get_project_files, (token, project_id), [])
+    })
+    project = results['project']
+    files = results['files']
+
     if not project:
-        flash('Project not found or access denied')
+        if 'project' in failed:
+            # Timed out or errored; the project may well exist
+            flash_failed_panels(failed)
+        else:
+            flash('Project not found or access denied')
         return redirect(url_for('index'))
-        
+
+    flash_failed_panels(failed)
     return render_template(
         'project_detail.html',
         project=project,
@@ -158,7 +423,11 @@ def group_detail(group_id):
     if not token:
         return redirect(url_for('login'))
     
-    projects = get_group_projects(token, group_id)
+    projects = None
+    if GITLAB_BACKEND == 'graphql':
+        projects = graphql.group_projects(get_gitlab_headers(token), group_id, limit=LIST_LIMIT)
+    if projects is None:
+        projects = list(iter_group_projects(token, group_id, LIST_LIMIT))
     
     return render_template(
         'group_detail.html',
@@ -166,5 +435,41 @@ def group_detail(group_id):
         projects=projects
     )
 
+@app.route('/search')
+def search():
+    """Search the organisation index for projects and groups."""
+    token = session.get('gitlab_token')
+    if not token:
+        return redirect(url_for('login'))
+    if org_crawler is None:
+        flash('Search is not enabled on this server')
+        return redirect(url_for('index'))
+
+    headers = get_gitlab_headers(token)
+    org_crawler.ensure_fresh(headers)
+    query = request.args.get('q', '').strip()
+    indexing = not org_crawler.is_ready(headers)
+    projects, groups = [], []
+    if query and not indexing:
+        projects, groups = org_index.search(token_fingerprint(headers), query)
+    return render_template(
+        'search.html',
+        query=query,
+        projects=projects,
+        groups=groups,
+        indexing=indexing
+    )
+
+@app.route('/webhooks/gitlab', methods=['POST'])
+def gitlab_webhook():
+    """Receive GitLab push, merge request, project and membership events."""
+    body, status = webhooks.receive(
+        webhook_invalidator,
+        GITLAB_WEBHOOK_SECRET,
+        request.headers.get('X-Gitlab-Token'),
+        request.get_json(silent=True)
+    )
+    return jsonify(body), status
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
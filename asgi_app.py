@@ -0,0 +1,277 @@
+"""Async (ASGI) serving mode for the GitLab dashboard.
+
+The login, dashboard, project, group, webhook and metrics routes of app.py,
+written as coroutines on Quart (Flask's asyncio twin) with a shared
+``AsyncGitLabClient``. A single process can hold hundreds of in-flight GitLab
+requests instead of one per worker thread. Caches, the identity store, the
+tree index and the rate limiter are shared with app.py, so both modes can run
+side by side. Search and the organisation index, the GraphQL backend, the
+streamed dashboard, Server-Timing headers and the profiler are sync-only.
+Serve it with any ASGI server::
+
+    uvicorn asgi_app:app --port 5001
+"""
+import asyncio
+import time
+
+from quart import Quart, Response, flash, jsonify, redirect, render_template, request, session, url_for
+
+import app as sync_app
+import metrics
+from async_gitlab_client import AsyncGitLabClient
+from gitlab_client import pagination_deadline
+from metrics import decode_json
+from records import GroupRecord, ProjectRecord
+import webhooks
+
+app = Quart(__name__)
+app.secret_key = sync_app.app.secret_key
+
+gitlab = AsyncGitLabClient(
+    sync_app.GITLAB_API_URL,
+    timeout=sync_app.UPSTREAM_TIMEOUT,
+    cache=sync_app.response_cache
+)
+# One rate-limit budget for both modes, the same way the org crawler shares it
+gitlab.rate_limiter = sync_app.gitlab.rate_limiter
+gitlab.on_call(metrics.record_upstream)
+gitlab.on_unauthorized(sync_app.identity_cache.invalidate_headers)
+
+get_gitlab_headers = sync_app.get_gitlab_headers
+identity_cache = sync_app.identity_cache
+LIST_LIMIT = sync_app.LIST_LIMIT
+
+
+async def get_user_info(token):
+    """Get current user information from GitLab."""
+    response = await gitlab.get("/user", headers=get_gitlab_headers(token))
+    if response.status_code == 200:
+        return decode_json(response)
+    return None
+
+
+async def get_project_details(token, project_id):
+    """Get detailed information about a specific project."""
+    response = await gitlab.get(f"/projects/{project_id}", headers=get_gitlab_headers(token))
+    if response.status_code == 200:
+        return decode_json(response, ProjectRecord.decode)
+    return None
+
+
+async def get_project_files(token, project_id, path="", ref=None):
+    """Get files and directories within a project from the shared tree index.
+
+    Index builds fan out over their own thread pool, so they run off the
+    event loop.
+    """
+    return await asyncio.to_thread(sync_app.get_project_files, token, project_id, path, ref)
+
+
+async def list_projects(token, limit=None):
+    """List every project the user is a member of, using keyset pagination."""
+    return [project async for project in gitlab.paginate(
+        "/projects",
+        headers=get_gitlab_headers(token),
+        params={'membership': True, 'simple': True},
+        limit=limit,
+        keyset=True,
+        decoder=ProjectRecord.decode
+    )]
+
+
+async def list_groups(token, limit=None):
+    """List every group the user is a member of."""
+    return [group async for group in gitlab.paginate(
+        "/groups",
+        headers=get_gitlab_headers(token),
+        limit=limit,
+        decoder=GroupRecord.decode
+    )]
+
+
+async def list_group_projects(token, group_id, limit=None):
+    """List every project in a group."""
+    return [project async for project in gitlab.paginate(
+        f"/groups/{group_id}/projects",
+        headers=get_gitlab_headers(token),
+        params={'simple': True},
+        limit=limit,
+        decoder=ProjectRecord.decode
+    )]
+
+
+async def verify_identity(token):
+    """Check the token against /user and cache the identity if it works."""
+    user_info = await get_user_info(token)
+    if user_info:
+        identity_cache.remember(token, user_info)
+    return user_info
+
+
+async def fetch_concurrently(calls, timeout=sync_app.UPSTREAM_TIMEOUT):
+    """Await independent upstream calls together.
+
+    ``calls`` maps a name to a ``(coroutine, default)`` pair. Same contract
+    as ``app.fetch_concurrently``: returns ``(results, failed)``, and a call
+    that raises or overruns ``timeout`` gets its default.
+    """
+    names = list(calls)
+    # Timed-out coroutines are cancelled; this also stops work they handed
+    # to threads (such as tree index builds) from paging past the deadline
+    deadline = pagination_deadline.set(time.monotonic() + timeout)
+    try:
+        outcomes = await asyncio.gather(
+            *(asyncio.wait_for(calls[name][0], timeout) for name in names),
+            return_exceptions=True
+        )
+    finally:
+        pagination_deadline.reset(deadline)
+    results = {}
+    failed = []
+    for name, outcome in zip(names, outcomes):
+        if isinstance(outcome, BaseException):
+            results[name] = calls[name][1]
+            failed.append(name)
+        else:
+            results[name] = outcome
+    return results, failed
+
+
+async def flash_failed_panels(failed):
+    """Tell the user which sections could not be loaded in time."""
+    if failed:
+        await flash(f"Some data could not be loaded from GitLab: {', '.join(failed)}")
+
+
+@app.route('/')
+async def index():
+    """Main page - requires authentication."""
+    token = session.get('gitlab_token')
+    if not token:
+        return await render_template('login.html')
+
+    calls = {
+        'projects': (list_projects(token, LIST_LIMIT), []),
+        'groups': (list_groups(token, LIST_LIMIT), [])
+    }
+    if identity_cache.get(token) is None:
+        calls['user'] = (verify_identity(token), None)
+    results, failed = await fetch_concurrently(calls)
+    # Re-read so a 401 from the project or group listings counts as a failed login
+    user_info = identity_cache.get(token)
+    if not user_info:
+        if 'user' in failed:
+            await flash('GitLab did not respond in time. Please try again.')
+        else:
+            session.pop('gitlab_token', None)
+            await flash('Authentication failed. Please enter a valid token.')
+        return await render_template('login.html')
+
+    await flash_failed_panels(failed)
+    return await render_template(
+        'dashboard.html',
+        user=user_info,
+        projects=results['projects'],
+        groups=results['groups']
+    )
+
+
+@app.route('/login', methods=['GET', 'POST'])
+async def login():
+    """Handle user login with GitLab API token."""
+    if request.method == 'POST':
+        form = await request.form
+        token = form.get('gitlab_token')
+        if token:
+            # Verify token works
+            user_info = await verify_identity(token)
+            if user_info:
+                session['gitlab_token'] = token
+                return redirect(url_for('index'))
+            else:
+                await flash('Invalid GitLab API token')
+        else:
+            await flash('Please provide a GitLab API token')
+
+    return await render_template('login.html')
+
+
+@app.route('/logout')
+async def logout():
+    """Log out the user by removing the token."""
+    token = session.pop('gitlab_token', None)
+    if token:
+        identity_cache.invalidate(token)
+    await flash('You have been logged out')
+    return redirect(url_for('index'))
+
+
+@app.route('/project/<int:project_id>')
+async def project_detail(project_id):
+    """Show project details."""
+    token = session.get('gitlab_token')
+    if not token:
+        return redirect(url_for('login'))
+
+    results, failed = await fetch_concurrently({
+        'project': (get_project_details(token, project_id), None),
+        'files': (get_project_files(token, project_id), [])
+    })
+    project = results['project']
+    if not project:
+        if 'project' in failed:
+            # Timed out or errored; the project may well exist
+            await flash_failed_panels(failed)
+        else:
+            await flash('Project not found or access denied')
+        return redirect(url_for('index'))
+
+    await flash_failed_panels(failed)
+    return await render_template(
+        'project_detail.html',
+        project=project,
+        files=results['files']
+    )
+
+
+@app.route('/group/<int:group_id>')
+async def group_detail(group_id):
+    """Show group details and projects."""
+    token = session.get('gitlab_token')
+    if not token:
+        return redirect(url_for('login'))
+
+    projects = await list_group_projects(token, group_id, LIST_LIMIT)
+
+    return await render_template(
+        'group_detail.html',
+        group_id=group_id,
+        projects=projects
+    )
+
+
+@app.route('/webhooks/gitlab', methods=['POST'])
+async def gitlab_webhook():
+    """Receive GitLab events; invalidates the caches shared with app.py."""
+    payload = await request.get_json(silent=True)
+    # Invalidation takes locks and may write to the org index
+    body, status = await asyncio.to_thread(
+        webhooks.receive,
+        sync_app.webhook_invalidator,
+        sync_app.GITLAB_WEBHOOK_SECRET,
+        request.headers.get('X-Gitlab-Token'),
+        payload
+    )
+    return jsonify(body), status
+
+
+@app.route('/metrics')
+async def metrics_endpoint():
+    """Prometheus metrics; counters are shared with the sync app in this process."""
+    extra = metrics.cache_metric_lines(sync_app.response_cache.stats())
+    return Response(metrics.render_prometheus(extra), mimetype='text/plain; version=0.0.4')
+
+
+@app.after_serving
+async def close_client():
+    await gitlab.aclose()
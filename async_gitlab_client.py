@@ -0,0 +1,164 @@
+"""Asyncio counterpart of ``GitLabClient`` for the ASGI serving mode."""
+import asyncio
+import time
+
+import httpx
+
+from gitlab_client import (GITLAB_API_URL, IDEMPOTENT_METHODS, RETRY_STATUS_CODES,
+                           RateLimiter, backoff_delay)
+from metrics import decode_json
+from response_cache import CachedResponse, api_path
+
+
+class AsyncGitLabClient:
+    """Non-blocking GitLab API client built on ``httpx.AsyncClient``.
+
+    Mirrors ``GitLabClient``: pooled keep-alive connections, shared
+    rate-limit state, jittered retries for idempotent requests, the same
+    ``ResponseCache`` and the same call observers and 401 callbacks. One
+    instance can carry hundreds of in-flight requests on a single event loop.
+    """
+
+    def __init__(self, base_url=GITLAB_API_URL, max_connections=100, timeout=10,
+                 max_retries=3, backoff=0.5, max_backoff=30, min_remaining=10,
+                 cache=None):
+        self.base_url = base_url.rstrip('/')
+        self.cache = cache
+        self.unauthorized_callbacks = []
+        self.call_observers = []
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.rate_limiter = RateLimiter(min_remaining, max_backoff)
+        self.http = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections)
+        )
+
+    def url(self, path):
+        """Return the absolute URL for an API path."""
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.base_url}{path}"
+
+    async def request(self, method, path, headers=None, params=None, json=None):
+        """Send a request, throttling and retrying as needed."""
+        method = method.upper()
+        url = self.url(path)
+        call = {'retries': 0, 'bytes': 0, 'cache': 'bypass'}
+        started = time.perf_counter()
+        response = None
+        try:
+            if self.cache is not None and method == 'GET':
+                response = await self._cached_get(url, headers, params, call)
+            else:
+                response = await self._send(method, url, headers, params, json, call)
+            return response
+        finally:
+            if self.call_observers:
+                elapsed = time.perf_counter() - started
+                endpoint = api_path(url, self.base_url)
+                for observer in self.call_observers:
+                    observer(method, endpoint, response, elapsed, call)
+
+    def on_call(self, observer):
+        """Register ``observer(method, path, response, elapsed, call)`` for every request."""
+        self.call_observers.append(observer)
+
+    def on_unauthorized(self, callback):
+        """Register ``callback(headers)`` to run whenever GitLab answers 401."""
+        self.unauthorized_callbacks.append(callback)
+
+    async def get(self, path, headers=None, params=None):
+        """Send a GET request."""
+        return await self.request('GET', path, headers=headers, params=params)
+
+    async def post(self, path, headers=None, json=None):
+        """Send a POST request."""
+        return await self.request('POST', path, headers=headers, json=json)
+
+    async def paginate(self, path, headers=None, params=None, per_page=100,
+                       limit=None, keyset=False, order_by='id', decoder=None):
+        """Async-iterate records from a list endpoint, following ``Link`` headers."""
+        params = dict(params or {})
+        params.setdefault('per_page', per_page)
+        if keyset:
+            params.setdefault('pagination', 'keyset')
+            params.setdefault('order_by', order_by)
+            params.setdefault('sort', 'asc')
+        url = path
+        yielded = 0
+        while url:
+            response = await self.get(url, headers=headers, params=params)
+            if response.status_code != 200:
+                return
+            for record in decode_json(response, decoder):
+                if limit is not None and yielded >= limit:
+                    return
+                yielded += 1
+                yield record
+            if limit is not None and yielded >= limit:
+                return
+            url, params = response.links.get('next', {}).get('url'), None
+
+    async def aclose(self):
+        """Release pooled connections."""
+        await self.http.aclose()
+
+    async def _cached_get(self, url, headers, params, call):
+        """Serve a GET from the cache, revalidating stale entries."""
+        key = self.cache.key(url, headers, params)
+        entry = self.cache.get(key)
+        if entry is not None and entry.is_fresh():
+            self.cache.record('hit')
+            call['cache'] = 'hit'
+            return CachedResponse(entry)
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            request_headers.update(self.cache.conditional_headers(entry))
+        response = await self._send('GET', url, request_headers, params, None, call)
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(entry, response)
+            self.cache.record('revalidated')
+            call['cache'] = 'revalidated'
+            return CachedResponse(entry)
+
+        self.cache.record('miss')
+        call['cache'] = 'miss'
+        if response.status_code == 200:
+            entry = self.cache.store(key, api_path(url, self.base_url), response)
+            return CachedResponse(entry)
+        return response
+
+    async def _send(self, method, url, headers, params, json, call):
+        """Send one logical request with throttling and retries."""
+        retries = self.max_retries if method in IDEMPOTENT_METHODS else 0
+        attempt = 0
+        while True:
+            delay = self.rate_limiter.delay()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            try:
+                response = await self.http.request(method, url, headers=headers,
+                                                   params=params, json=json)
+            except (httpx.TransportError, httpx.TimeoutException):
+                if attempt >= retries:
+                    raise
+                attempt += 1
+                call['retries'] = attempt
+                await asyncio.sleep(backoff_delay(attempt, self.backoff, self.max_backoff))
+                continue
+
+            retry_after = self.rate_limiter.record(response.headers)
+            if response.status_code == 401:
+                for callback in self.unauthorized_callbacks:
+                    callback(headers)
+            if response.status_code in RETRY_STATUS_CODES and attempt < retries:
+                attempt += 1
+                call['retries'] = attempt
+                await asyncio.sleep(retry_after or backoff_delay(attempt, self.backoff, self.max_backoff))
+                continue
+            call['bytes'] = len(response.content)
+            return response
@@ -0,0 +1,202 @@
+"""End-to-end latency benchmark for the dashboard routes.
+
+Starts mock_gitlab.py in-process, points app.py (or asgi_app.py with
+``--mode asgi``) at it via GITLAB_API_URL and drives the routes under
+concurrent load. Reports p50/p95/p99 latency, throughput and upstream GitLab
+calls per request::
+
+    python benchmark.py --concurrency 16 --requests 400 --latency-ms 50
+    python benchmark.py --mode asgi --concurrency 200 --requests 2000 --latency-ms 50
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import fields
+
+import requests
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from mock_gitlab import MockConfig, create_mock_app
+
+BENCH_TOKEN = 'bench-token'
+
+ROUTES = {
+    'index': '/',
+    'project': '/project/1',
+    'group': '/group/1',
+}
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    """Request handler that keeps the access log out of the benchmark output."""
+
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def start_mock_server(config):
+    """Serve the mock GitLab API on a free local port; returns ``(server, api_url)``."""
+    mock_app = create_mock_app(config)
+    server = make_server('127.0.0.1', 0, mock_app, threaded=True,
+                         request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/api/v4"
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a sorted list."""
+    if not samples:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(samples)), 1)
+    return samples[rank - 1]
+
+
+def summarize(results, elapsed):
+    """Latency percentiles and throughput for ``(seconds, status)`` samples."""
+    total = len(results)
+    latencies = sorted(latency * 1000 for latency, _ in results)
+    errors = sum(1 for _, status in results if status >= 400)
+    return {
+        'requests': total,
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'mean_ms': round(statistics.fmean(latencies), 2),
+        'throughput_rps': round(total / elapsed, 1),
+    }
+
+
+def run_route(flask_app, path, total, concurrency):
+    """Issue ``total`` GETs to ``path`` from ``concurrency`` threads."""
+    local = threading.local()
+
+    def client():
+        if not hasattr(local, 'client'):
+            local.client = flask_app.test_client()
+            with local.client.session_transaction() as session:
+                session['gitlab_token'] = BENCH_TOKEN
+        return local.client
+
+    def one(_):
+        start = time.perf_counter()
+        response = client().get(path)
+        response.get_data()
+        return time.perf_counter() - start, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(one, range(total)))
+    return summarize(results, time.perf_counter() - started)
+
+
+async def run_route_async(quart_app, path, total, concurrency):
+    """Issue ``total`` GETs to ``path`` from ``concurrency`` coroutines on one event loop."""
+    client = quart_app.test_client()
+    async with client.session_transaction() as session:
+        session['gitlab_token'] = BENCH_TOKEN
+    pending = iter(range(total))
+    results = []
+
+    async def worker():
+        for _ in pending:
+            start = time.perf_counter()
+            response = await client.get(path)
+            await response.get_data()
+            results.append((time.perf_counter() - start, response.status_code))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(results, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mode', choices=('wsgi', 'asgi'), default='wsgi',
+                        help='benchmark the threaded Flask app or the asyncio Quart app')
+    parser.add_argument('--routes', nargs='+', choices=sorted(ROUTES), default=list(ROUTES))
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--disable-cache', action='store_true',
+                        help='bypass the response cache to measure raw upstream cost')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    parser.add_argument('--api-url', help='use a mock_gitlab.py already running in another process '
+                                          '(e.g. http://127.0.0.1:8929/api/v4) instead of an in-process one')
+    defaults = MockConfig()
+    for field in fields(MockConfig):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=type(getattr(defaults, field.name)),
+                            default=getattr(defaults, field.name))
+    args = parser.parse_args()
+
+    if args.api_url:
+        server, api_url = None, args.api_url.rstrip('/')
+        mock_url = api_url.rsplit('/api/', 1)[0]
+        stats = {}
+
+        def reset_stats():
+            requests.post(f"{mock_url}/__mock__/reset").raise_for_status()
+
+        def read_stats():
+            stats.clear()
+            stats.update(requests.get(f"{mock_url}/__mock__/stats").json())
+    else:
+        config = MockConfig(**{field.name: getattr(args, field.name) for field in fields(MockConfig)})
+        server, api_url = start_mock_server(config)
+        stats = server.app.config['MOCK_STATS']
+        reset_stats = stats.clear
+
+        def read_stats():
+            pass
+    os.environ['GITLAB_API_URL'] = api_url
+    import app  # imported late so it picks up GITLAB_API_URL
+
+    if args.disable_cache:
+        app.gitlab.cache = None
+    if args.mode == 'asgi':
+        import asgi_app
+        if args.disable_cache:
+            asgi_app.gitlab.cache = None
+        loop = asyncio.new_event_loop()
+
+    report = {}
+    for name in args.routes:
+        reset_stats()
+        if args.mode == 'asgi':
+            result = loop.run_until_complete(
+                run_route_async(asgi_app.app, ROUTES[name], args.requests, args.concurrency))
+        else:
+            result = run_route(app.app, ROUTES[name], args.requests, args.concurrency)
+        read_stats()
+        upstream = {key: count for key, count in stats.items() if key != 'total'}
+        result['upstream_calls'] = stats.get('total', 0)
+        result['upstream_per_request'] = round(result['upstream_calls'] / args.requests, 2)
+        result['upstream_by_endpoint'] = upstream
+        report[name] = result
+
+    if server is not None:
+        server.shutdown()
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    header = f"{'route':<10}{'reqs':>6}{'errs':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}{'up/req':>8}"
+    print(header)
+    print('-' * len(header))
+    for name, result in report.items():
+        print(f"{name:<10}{result['requests']:>6}{result['errors']:>6}"
+              f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+              f"{result['throughput_rps']:>9.1f}{result['upstream_per_request']:>8.2f}")
+    for name, result in report.items():
+        print(f"\n{name} upstream calls:")
+        for endpoint, count in sorted(result['upstream_by_endpoint'].items()):
+            print(f"  {count:>6}  {endpoint}")
+
+
+if __name__ == '__main__':
+    main()
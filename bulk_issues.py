@@ -0,0 +1,231 @@
+"""Bulk issue creation from CSV or JSON, safe to re-run after a partial failure.
+
+Every issue carries an idempotency key in a hidden marker at the end of its
+description. Before creating anything, the project's existing markers are
+fetched, and rows whose key is already present are skipped.
+"""
+import hashlib
+import io
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from metrics import decode_json
+
+KEY_MARKER = 'bulk-import-key'
+_KEY_RE = re.compile(rf'<!-- {KEY_MARKER}: ([\w.-]+) -->')
+
+# Upload columns forwarded to the issues API; anything else is rejected
+ISSUE_FIELDS = ('title', 'description', 'labels', 'assignee_ids', 'milestone_id',
+                'due_date', 'confidential', 'weight')
+KEY_COLUMN = 'key'
+MAX_TITLE_LENGTH = 255
+
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def read_upload(name, data):
+    """Parse an uploaded ``.csv`` or ``.json`` file into a DataFrame of strings."""
+    if name.lower().endswith('.json'):
+        records = json.loads(data)
+        if not isinstance(records, list) or not all(isinstance(record, dict) for record in records):
+            raise ValueError('JSON upload must be a list of issue objects')
+        return pd.DataFrame.from_records(records).astype(object).where(lambda df: df.notna(), None)
+    return pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False)
+
+
+def issue_key(row):
+    """Explicit ``key`` column value, or a digest of the title and description."""
+    explicit = str(row.get(KEY_COLUMN) or '').strip()
+    if explicit:
+        return explicit
+    content = f"{row.get('title', '').strip()}\n{(row.get('description') or '').strip()}"
+    return hashlib.sha256(content.encode()).hexdigest()[:16]
+
+
+def validate(frame):
+    """Check every row before anything is sent.
+
+    Returns ``(issues, errors)``: ``issues`` is a list of ``(row_number, key,
+    payload)`` and ``errors`` a list of ``(row_number, message)``. Row
+    numbers are 1-based, counting data rows only.
+    """
+    errors = []
+    unknown = sorted(set(frame.columns) - set(ISSUE_FIELDS) - {KEY_COLUMN})
+    if unknown:
+        errors.append((0, f"Unknown columns: {', '.join(unknown)}"))
+    if 'title' not in frame.columns:
+        errors.append((0, 'Missing required column: title'))
+        return [], errors
+
+    issues = []
+    seen = {}
+    for number, row in enumerate(frame.to_dict('records'), start=1):
+        row = {column: _clean(value) for column, value in row.items() if column in ISSUE_FIELDS + (KEY_COLUMN,)}
+        try:
+            payload = _payload(row)
+        except ValueError as e:
+            errors.append((number, str(e)))
+            continue
+        title = payload.get('title') or ''
+        if not title:
+            errors.append((number, 'title is empty'))
+            continue
+        if len(title) > MAX_TITLE_LENGTH:
+            errors.append((number, f'title is longer than {MAX_TITLE_LENGTH} characters'))
+            continue
+        if payload.get('due_date') and not _DATE_RE.match(payload['due_date']):
+            errors.append((number, 'due_date must be YYYY-MM-DD'))
+            continue
+        if isinstance(row.get(KEY_COLUMN), (dict, list, bool)):
+            errors.append((number, 'key must be a string'))
+            continue
+
+        key = issue_key(row)
+        if not re.fullmatch(r'[\w.-]+', key):
+            errors.append((number, 'key may only contain letters, digits, "_", "." and "-"'))
+            continue
+        if key in seen:
+            errors.append((number, f'duplicate of row {seen[key]} (key {key})'))
+            continue
+        seen[key] = number
+        payload['description'] = f"{payload.get('description', '')}\n\n<!-- {KEY_MARKER}: {key} -->".lstrip()
+        issues.append((number, key, payload))
+    return issues, errors
+
+
+def _clean(value):
+    # JSON uploads keep their types; _payload rejects the ones a field can't take
+    if isinstance(value, str):
+        return value.strip() or None
+    return value
+
+
+def _integer(value):
+    """Return ``value`` as an int, or None if it is not a whole number."""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    # Integer JSON columns with gaps arrive as floats
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else None
+    if isinstance(value, str) and re.fullmatch(r'[+-]?\d+', value.strip()):
+        return int(value)
+    return None
+
+
+def _payload(row):
+    payload = {}
+    for field in ISSUE_FIELDS:
+        value = row.get(field)
+        if value is None:
+            continue
+        if field in ('title', 'description', 'due_date'):
+            if not isinstance(value, str):
+                raise ValueError(f'{field} must be a string')
+        elif field == 'labels':
+            if isinstance(value, list) and all(isinstance(label, str) for label in value):
+                value = ','.join(value)
+            elif not isinstance(value, str):
+                raise ValueError('labels must be a string or a list of strings')
+        elif field == 'assignee_ids':
+            items = value.split(',') if isinstance(value, str) else value
+            ids = [_integer(item) for item in items] if isinstance(items, list) else [None]
+            if None in ids:
+                raise ValueError('assignee_ids must be comma-separated integers')
+            value = ids
+        elif field in ('milestone_id', 'weight'):
+            value = _integer(value)
+            if value is None:
+                raise ValueError(f'{field} must be an integer')
+        elif field == 'confidential':
+            if isinstance(value, str) and value.lower() in ('true', 'false', '1', '0', 'yes', 'no'):
+                value = value.lower() in ('true', '1', 'yes')
+            elif not isinstance(value, bool):
+                raise ValueError('confidential must be true or false')
+        payload[field] = value
+    return payload
+
+
+class Throttle:
+    """Spaces calls at least ``1 / rate`` seconds apart across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def existing_keys(client, headers, project_id):
+    """Return the idempotency keys of issues already in the project."""
+    keys = set()
+    for issue in client.paginate(
+        f"/projects/{project_id}/issues",
+        headers=headers,
+        params={'search': KEY_MARKER, 'in': 'description', 'state': 'all'},
+        strict=True
+    ):
+        keys.update(_KEY_RE.findall(issue.get('description') or ''))
+    return keys
+
+
+def create_issues(client, headers, project_id, issues, concurrency=4, rate=5.0, max_attempts=3):
+    """Create ``issues`` from ``validate`` and yield a result dict per row as each finishes.
+
+    Rows whose key already exists in the project are yielded as ``skipped``
+    without a request. At most ``concurrency`` requests are in flight and no
+    more than ``rate`` are started per second. A 429 is retried after its
+    ``Retry-After``; nothing else is, since a POST that timed out may still
+    have created the issue (the next run's key check will catch it).
+    """
+    done = existing_keys(client, headers, project_id)
+    throttle = Throttle(rate)
+
+    def create(number, key, payload):
+        result = {'row': number, 'key': key, 'title': payload['title'],
+                  'status': 'failed', 'iid': None, 'web_url': None, 'error': None}
+        for attempt in range(1, max_attempts + 1):
+            throttle.wait()
+            try:
+                response = client.post(f"/projects/{project_id}/issues", headers=headers, json=payload)
+            except Exception as e:
+                result['error'] = str(e)
+                return result
+            if response.status_code == 429 and attempt < max_attempts:
+                time.sleep(float(response.headers.get('Retry-After', 1)))
+                continue
+            if response.status_code == 201:
+                issue = decode_json(response)
+                result.update(status='created', iid=issue.get('iid'), web_url=issue.get('web_url'))
+            else:
+                result['error'] = f"HTTP {response.status_code}: {response.text[:200]}"
+            return result
+        return result
+
+    pending = []
+    for number, key, payload in issues:
+        if key in done:
+            yield {'row': number, 'key': key, 'title': payload['title'],
+                   'status': 'skipped', 'iid': None, 'web_url': None, 'error': 'already created'}
+        else:
+            pending.append((number, key, payload))
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bulk-issues') as executor:
+        futures = [executor.submit(create, *issue) for issue in pending]
+        for future in as_completed(futures):
+            yield future.result()
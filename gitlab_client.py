@@ -0,0 +1,376 @@
+"""Shared GitLab API client with connection pooling and rate-limit handling."""
+import contextvars
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import decode_json
+from response_cache import CachedResponse, api_path
+
+# GitLab API base URL
+GITLAB_API_URL = "https://gitlab.com/api/v4"
+
+# Only these methods are safe to replay after a failure
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+RETRY_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# ``time.monotonic()`` after which pagination stops asking for more pages. Set
+# in the context of a call whose caller may stop waiting for it (see app.py's
+# fetch_concurrently), so an abandoned listing stops using workers and quota.
+pagination_deadline = contextvars.ContextVar('pagination_deadline', default=None)
+
+
+class RateLimiter:
+    """Rate-limit state learned from GitLab's response headers.
+
+    Shared by every request a client makes, so one 429 or a nearly spent
+    quota slows all of them down, not just the request that saw it.
+    """
+
+    def __init__(self, min_remaining=10, max_wait=30):
+        self.min_remaining = min_remaining
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._remaining = None
+        self._reset_at = 0.0
+        self._blocked_until = 0.0
+
+    def delay(self):
+        """Return how long to wait before the next request."""
+        with self._lock:
+            now = time.time()
+            delay = self._blocked_until - now
+            if delay <= 0 and self._remaining is not None and self._remaining <= self.min_remaining:
+                window = self._reset_at - now
+                if window > 0:
+                    # Spread what is left of the quota over the rest of the window
+                    delay = window / max(self._remaining, 1)
+                    self._remaining = max(self._remaining - 1, 0)
+        return min(max(delay, 0), self.max_wait)
+
+    def record(self, headers):
+        """Update the state from response headers and return any Retry-After delay."""
+        retry_after = _parse_float(headers.get('Retry-After'))
+        remaining = _parse_float(headers.get('RateLimit-Remaining'))
+        reset_at = _parse_float(headers.get('RateLimit-Reset'))
+        with self._lock:
+            if remaining is not None:
+                self._remaining = int(remaining)
+            if reset_at is not None:
+                self._reset_at = reset_at
+            if retry_after is not None:
+                self._blocked_until = max(self._blocked_until, time.time() + retry_after)
+        if retry_after is not None:
+            return min(retry_after, self.max_wait)
+        return None
+
+
+class GitLabClient:
+    """Thread-safe GitLab API client shared by every helper.
+
+    Connections are kept alive in a pool, GitLab's ``RateLimit-*`` and
+    ``Retry-After`` headers are used to slow down before the quota runs out,
+    and idempotent requests are retried with jittered exponential backoff.
+    When a ``ResponseCache`` is given, plain GETs are served from it and
+    revalidated with conditional requests.
+    """
+
+    def __init__(self, base_url=GITLAB_API_URL, pool_size=20, timeout=10,
+                 max_retries=3, backoff=0.5, max_backoff=30, min_remaining=10,
+                 cache=None):
+        self.base_url = base_url.rstrip('/')
+        self.cache = cache
+        self.unauthorized_callbacks = []
+        self.call_observers = []
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        self.rate_limiter = RateLimiter(min_remaining, max_backoff)
+
+    def url(self, path):
+        """Return the absolute URL for an API path."""
+        if path.startswith(('http://', 'https://')):
+            return path
+        return f"{self.base_url}{path}"
+
+    def request(self, method, path, headers=None, params=None, json=None,
+                timeout=None, stream=False):
+        """Send a request, throttling and retrying as needed.
+
+        Non-idempotent methods are sent once; the caller decides what to do
+        with a failed POST.
+        """
+        method = method.upper()
+        url = self.url(path)
+        call = {'retries': 0, 'bytes': 0, 'cache': 'bypass'}
+        started = time.perf_counter()
+        response = None
+        try:
+            if self.cache is not None and method == 'GET' and not stream:
+                response = self._cached_get(url, headers, params, timeout, call)
+            else:
+                response = self._send(method, url, headers, params, json, timeout, stream, call)
+            return response
+        finally:
+            if self.call_observers:
+                elapsed = time.perf_counter() - started
+                endpoint = api_path(url, self.base_url)
+                for observer in self.call_observers:
+                    observer(method, endpoint, response, elapsed, call)
+
+    def on_call(self, observer):
+        """Register ``observer(method, path, response, elapsed, call)`` for every request.
+
+        ``call`` carries ``retries``, ``bytes`` received and the ``cache``
+        outcome (``hit``, ``miss``, ``revalidated`` or ``bypass``);
+        ``response`` is None if the request raised.
+        """
+        self.call_observers.append(observer)
+
+    def on_unauthorized(self, callback):
+        """Register ``callback(headers)`` to run whenever GitLab answers 401."""
+        self.unauthorized_callbacks.append(callback)
+
+    def get(self, path, headers=None, params=None, **kwargs):
+        """Send a GET request."""
+        return self.request('GET', path, headers=headers, params=params, **kwargs)
+
+    def post(self, path, headers=None, json=None, **kwargs):
+        """Send a POST request."""
+        return self.request('POST', path, headers=headers, json=json, **kwargs)
+
+    def paginate(self, path, headers=None, params=None, per_page=100,
+                 limit=None, keyset=False, order_by='id', strict=False, decoder=None):
+        """Yield records from a list endpoint, one page at a time.
+
+        Follows the ``Link: rel="next"`` header, falling back to
+        ``X-Next-Page``. With ``keyset=True`` GitLab's keyset pagination is
+        requested, which stays fast on deep pages. Iteration stops after
+        ``limit`` records or as soon as the caller stops consuming. An error
+        response ends iteration quietly unless ``strict`` is set, in which case
+        ``requests.HTTPError`` is raised so a partial listing can be told
+        apart from a complete one. ``decoder`` converts each decoded page,
+        e.g. ``ProjectRecord.decode``, and is what cached pages keep.
+        """
+        base_params = dict(params or {})
+        base_params.setdefault('per_page', per_page)
+        if keyset:
+            base_params.setdefault('pagination', 'keyset')
+            base_params.setdefault('order_by', order_by)
+            base_params.setdefault('sort', 'asc')
+        yield from self._follow_pages(path, headers, base_params, limit, strict, decoder)
+
+    def paginate_parallel(self, path, headers=None, params=None, per_page=100,
+                          limit=None, max_workers=4, strict=False, decoder=None):
+        """Yield records from an offset-paginated endpoint, fetching pages concurrently.
+
+        The first page is fetched on its own to learn ``X-Total-Pages``; the
+        remaining pages are then requested ``max_workers`` at a time and
+        yielded in order. GitLab omits the total for very large collections,
+        in which case this falls back to following ``Link`` headers.
+        ``strict`` and ``decoder`` behave as in ``paginate``.
+        """
+        base_params = dict(params or {})
+        base_params['per_page'] = per_page
+        if _past_deadline(path, strict):
+            return
+        first = self.get(path, headers=headers, params={**base_params, 'page': 1})
+        if first.status_code != 200:
+            if strict:
+                raise _status_error(first, path)
+            return
+        records = decode_json(first, decoder)
+        yield from records[:limit]
+        if limit is not None:
+            limit -= len(records)
+            if limit <= 0:
+                return
+
+        total_pages = _parse_float(first.headers.get('X-Total-Pages'))
+        if total_pages is None:
+            next_url = first.links.get('next', {}).get('url')
+            if next_url:
+                yield from self._follow_pages(next_url, headers, None, limit, strict, decoder)
+            return
+
+        last_page = int(total_pages)
+        if limit is not None:
+            last_page = min(last_page, 1 + -(-limit // per_page))
+
+        def fetch(page):
+            if _past_deadline(path, strict):
+                return []
+            response = self.get(path, headers=headers, params={**base_params, 'page': page})
+            if response.status_code == 200:
+                return decode_json(response, decoder)
+            if strict:
+                raise _status_error(response, path)
+            return []
+
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gitlab-pages')
+        try:
+            pages = iter(range(2, last_page + 1))
+            # Page fetches run in a copy of the caller's context so they are
+            # attributed to the request that triggered them
+            pending = deque(executor.submit(contextvars.copy_context().run, fetch, page)
+                            for _, page in zip(range(max_workers), pages))
+            while pending:
+                records = pending.popleft().result()
+                page = next(pages, None)
+                if page is not None:
+                    pending.append(executor.submit(contextvars.copy_context().run, fetch, page))
+                for record in records:
+                    if limit is not None:
+                        if limit <= 0:
+                            return
+                        limit -= 1
+                    yield record
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        """Release pooled connections."""
+        self.session.close()
+
+    def _cached_get(self, url, headers, params, timeout, call):
+        """Serve a GET from the cache, revalidating stale entries."""
+        key = self.cache.key(url, headers, params)
+        entry = self.cache.get(key)
+        if entry is not None and entry.is_fresh():
+            self.cache.record('hit')
+            call['cache'] = 'hit'
+            return CachedResponse(entry)
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            request_headers.update(self.cache.conditional_headers(entry))
+        response = self._send('GET', url, request_headers, params, None, timeout, False, call)
+        if response.status_code == 304 and entry is not None:
+            self.cache.refresh(entry, response)
+            self.cache.record('revalidated')
+            call['cache'] = 'revalidated'
+            return CachedResponse(entry)
+
+        self.cache.record('miss')
+        call['cache'] = 'miss'
+        if response.status_code == 200:
+            entry = self.cache.store(key, api_path(url, self.base_url), response)
+            return CachedResponse(entry)
+        return response
+
+    def _send(self, method, url, headers, params, json, timeout, stream, call):
+        """Send one logical request with throttling and retries."""
+        retries = self.max_retries if method in IDEMPOTENT_METHODS else 0
+        attempt = 0
+        while True:
+            delay = self.rate_limiter.delay()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                response = self.session.request(
+                    method,
+                    url,
+                    headers=headers,
+                    params=params,
+                    json=json,
+                    timeout=timeout or self.timeout,
+                    stream=stream
+                )
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt >= retries:
+                    raise
+                attempt += 1
+                call['retries'] = attempt
+                time.sleep(self._backoff_delay(attempt))
+                continue
+
+            retry_after = self.rate_limiter.record(response.headers)
+            if response.status_code == 401:
+                for callback in self.unauthorized_callbacks:
+                    callback(headers)
+            if response.status_code in RETRY_STATUS_CODES and attempt < retries:
+                response.close()
+                attempt += 1
+                call['retries'] = attempt
+                time.sleep(retry_after or self._backoff_delay(attempt))
+                continue
+            if stream:
+                call['bytes'] = int(response.headers.get('Content-Length') or 0)
+            else:
+                call['bytes'] = len(response.content)
+            return response
+
+    def _follow_pages(self, url, headers, params, limit, strict=False, decoder=None):
+        """Yield records page by page until there is no next page."""
+        path, base_params = url, params
+        yielded = 0
+        while url:
+            if _past_deadline(url, strict):
+                return
+            response = self.get(url, headers=headers, params=params)
+            if response.status_code != 200:
+                if strict:
+                    raise _status_error(response, url)
+                return
+            for record in decode_json(response, decoder):
+                if limit is not None and yielded >= limit:
+                    return
+                yielded += 1
+                yield record
+            if limit is not None and yielded >= limit:
+                return
+
+            next_url = response.links.get('next', {}).get('url')
+            next_page = response.headers.get('X-Next-Page')
+            if next_url:
+                url, params = next_url, None
+            elif next_page and base_params is not None:
+                url, params = path, {**base_params, 'page': next_page}
+            else:
+                url = None
+
+    def _backoff_delay(self, attempt):
+        """Full-jitter exponential backoff for the given attempt number."""
+        return backoff_delay(attempt, self.backoff, self.max_backoff)
+
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff: uniform in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _past_deadline(url, strict):
+    """Return True once ``pagination_deadline`` has passed; strict listings raise instead."""
+    deadline = pagination_deadline.get()
+    if deadline is None or time.monotonic() < deadline:
+        return False
+    if strict:
+        raise requests.Timeout(f"Stopped listing {url}: the caller's deadline passed")
+    return True
+
+
+def _status_error(response, url):
+    """Build the HTTPError raised by strict pagination."""
+    return requests.HTTPError(f"GitLab returned {response.status_code} for {url}", response=response)
+
+
+def _parse_float(value):
+    """Parse a numeric header value, returning None when absent or malformed."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
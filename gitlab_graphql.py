@@ -0,0 +1,231 @@
+"""GitLab GraphQL backend for the dashboard and group pages.
+
+Fetches only the fields the templates render and returns them in the same
+shape as the REST helpers, so either backend can feed the same templates.
+"""
+import threading
+
+import requests
+
+from metrics import decode_json
+from records import GroupRecord, ProjectRecord
+
+PAGE_SIZE = 100
+
+PROJECT_FIELDS = """
+fragment ProjectFields on Project {
+  id
+  name
+  nameWithNamespace
+  fullPath
+  description
+  webUrl
+  avatarUrl
+  starCount
+  lastActivityAt
+  visibility
+}
+"""
+
+GROUP_FIELDS = """
+fragment GroupFields on Group {
+  id
+  name
+  fullName
+  fullPath
+  description
+  webUrl
+  avatarUrl
+}
+"""
+
+# One query serves the whole dashboard; the @include flags let follow-up
+# pages re-run it for just the connection that still has more results.
+DASHBOARD_QUERY = """
+query Dashboard($first: Int!, $projectsAfter: String, $groupsAfter: String,
+                $withProjects: Boolean!, $withGroups: Boolean!) {
+  currentUser {
+    id
+    username
+    name
+    avatarUrl
+    webUrl
+    groups(first: $first, after: $groupsAfter) @include(if: $withGroups) {
+      pageInfo { hasNextPage endCursor }
+      nodes { ...GroupFields }
+    }
+  }
+  projects(membership: true, first: $first, after: $projectsAfter) @include(if: $withProjects) {
+    pageInfo { hasNextPage endCursor }
+    nodes { ...ProjectFields }
+  }
+}
+""" + PROJECT_FIELDS + GROUP_FIELDS
+
+GROUP_PROJECTS_QUERY = """
+query GroupProjects($fullPath: ID!, $first: Int!, $after: String) {
+  group(fullPath: $fullPath) {
+    projects(first: $first, after: $after) {
+      pageInfo { hasNextPage endCursor }
+      nodes { ...ProjectFields }
+    }
+  }
+}
+""" + PROJECT_FIELDS
+
+
+def graphql_url(api_url):
+    """Return the GraphQL endpoint for a REST API base URL."""
+    base = api_url.rstrip('/')
+    if base.endswith('/v4'):
+        base = base[:-len('/v4')]
+    return f"{base}/graphql"
+
+
+def numeric_id(global_id):
+    """Turn ``gid://gitlab/Project/42`` into ``42``."""
+    return int(global_id.rsplit('/', 1)[-1])
+
+
+def user_record(node):
+    return {
+        'id': numeric_id(node['id']),
+        'username': node['username'],
+        'name': node['name'],
+        'avatar_url': node['avatarUrl'],
+        'web_url': node['webUrl'],
+    }
+
+
+def project_record(node):
+    return ProjectRecord(
+        id=numeric_id(node['id']),
+        name=node['name'],
+        name_with_namespace=node['nameWithNamespace'],
+        path_with_namespace=node['fullPath'],
+        description=node['description'],
+        web_url=node['webUrl'],
+        avatar_url=node['avatarUrl'],
+        star_count=node['starCount'],
+        last_activity_at=node['lastActivityAt'],
+        visibility=node['visibility'],
+    )
+
+
+def group_record(node):
+    return GroupRecord(
+        id=numeric_id(node['id']),
+        name=node['name'],
+        full_name=node['fullName'],
+        full_path=node['fullPath'],
+        description=node['description'],
+        web_url=node['webUrl'],
+        avatar_url=node['avatarUrl'],
+    )
+
+
+class GitLabGraphQL:
+    """Loads dashboard and group data through GitLab's GraphQL API.
+
+    Every method returns None when the query fails so callers can fall back
+    to the REST helpers.
+    """
+
+    def __init__(self, client, url=None):
+        self.client = client
+        self.url = url or graphql_url(client.base_url)
+        # GraphQL looks groups up by path; remember the paths seen on dashboards
+        self._group_paths = {}
+        self._lock = threading.Lock()
+
+    def query(self, query, variables, headers):
+        """Run a query and return its ``data``, or None on any error."""
+        try:
+            response = self.client.post(
+                self.url,
+                headers=headers,
+                json={'query': query, 'variables': variables}
+            )
+        except requests.RequestException:
+            return None
+        if response.status_code != 200:
+            return None
+        try:
+            payload = decode_json(response)
+        except ValueError:
+            return None
+        if not isinstance(payload, dict) or payload.get('errors'):
+            return None
+        return payload.get('data')
+
+    def dashboard(self, headers, limit=None):
+        """Return ``(user, projects, groups)`` for the token's owner."""
+        try:
+            return self._dashboard(headers, limit)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            # A response not shaped like the schema; use REST instead
+            return None
+
+    def group_projects(self, headers, group_id, limit=None):
+        """Return a group's projects, or None if the group's path is not known yet."""
+        with self._lock:
+            full_path = self._group_paths.get(group_id)
+        if full_path is None:
+            return None
+        try:
+            return self._group_projects(headers, full_path, limit)
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return None
+
+    def _dashboard(self, headers, limit):
+        variables = {
+            'first': PAGE_SIZE,
+            'projectsAfter': None,
+            'groupsAfter': None,
+            'withProjects': True,
+            'withGroups': True,
+        }
+        user = None
+        projects = []
+        groups = []
+        while variables['withProjects'] or variables['withGroups']:
+            data = self.query(DASHBOARD_QUERY, variables, headers)
+            if not data or not data.get('currentUser'):
+                return None
+            if user is None:
+                user = user_record(data['currentUser'])
+
+            if variables['withProjects']:
+                connection = data['projects']
+                projects.extend(project_record(node) for node in connection['nodes'])
+                variables['projectsAfter'] = connection['pageInfo']['endCursor']
+                variables['withProjects'] = _has_more(connection, projects, limit)
+            if variables['withGroups']:
+                connection = data['currentUser']['groups']
+                groups.extend(group_record(node) for node in connection['nodes'])
+                variables['groupsAfter'] = connection['pageInfo']['endCursor']
+                variables['withGroups'] = _has_more(connection, groups, limit)
+
+        with self._lock:
+            self._group_paths.update((group.id, group.full_path) for group in groups)
+        return user, projects[:limit], groups[:limit]
+
+    def _group_projects(self, headers, full_path, limit):
+        variables = {'fullPath': full_path, 'first': PAGE_SIZE, 'after': None}
+        projects = []
+        while True:
+            data = self.query(GROUP_PROJECTS_QUERY, variables, headers)
+            if not data or not data.get('group'):
+                return None
+            connection = data['group']['projects']
+            projects.extend(project_record(node) for node in connection['nodes'])
+            if not _has_more(connection, projects, limit):
+                return projects[:limit]
+            variables['after'] = connection['pageInfo']['endCursor']
+
+
+def _has_more(connection, records, limit):
+    """Return True if another page should be fetched for ``connection``."""
+    if limit is not None and len(records) >= limit:
+        return False
+    return connection['pageInfo']['hasNextPage']
@@ -0,0 +1,91 @@
+"""Server-side cache of verified GitLab identities, keyed by token fingerprint."""
+import threading
+import time
+
+from response_cache import token_fingerprint
+
+
+def _bearer_headers(token):
+    return {'Authorization': f'Bearer {token}'}
+
+
+class IdentityCache:
+    """Remembers which tokens resolved to which user.
+
+    A cached identity is served immediately. Once it is older than
+    ``revalidate_after`` seconds, it is re-checked in the background while
+    the cached value keeps being served. ``invalidate`` drops it at once; the
+    app wires this to every 401 the GitLab client sees.
+    """
+
+    def __init__(self, fetch_user, executor, revalidate_after=300, max_entries=10000):
+        self.fetch_user = fetch_user
+        self.executor = executor
+        self.revalidate_after = revalidate_after
+        self.max_entries = max_entries
+        self._entries = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """Return the cached user for ``token``, or None if it must be verified."""
+        fingerprint = token_fingerprint(_bearer_headers(token))
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                return None
+            user, verified_at = entry
+            stale = time.monotonic() - verified_at > self.revalidate_after
+            if stale and fingerprint not in self._refreshing:
+                self._refreshing.add(fingerprint)
+                self.executor.submit(self._revalidate, token, fingerprint)
+        return user
+
+    def verify(self, token):
+        """Fetch the user for ``token`` now and cache it if the token works."""
+        user = self.fetch_user(token)
+        if user:
+            self._store(token_fingerprint(_bearer_headers(token)), user)
+        return user
+
+    def remember(self, token, user):
+        """Cache a user obtained from another authenticated call."""
+        self._store(token_fingerprint(_bearer_headers(token)), user)
+
+    def invalidate(self, token):
+        """Forget the identity for ``token``."""
+        self.invalidate_headers(_bearer_headers(token))
+
+    def invalidate_headers(self, headers):
+        """Forget the identity for whatever credentials ``headers`` carry."""
+        with self._lock:
+            self._entries.pop(token_fingerprint(headers), None)
+
+    def fingerprints_for(self, user_id):
+        """Return the fingerprints of every cached token that belongs to ``user_id``."""
+        with self._lock:
+            return {
+                fingerprint for fingerprint, (user, _) in self._entries.items()
+                if user.get('id') == user_id
+            }
+
+    def _store(self, fingerprint, user):
+        with self._lock:
+            if fingerprint not in self._entries and len(self._entries) >= self.max_entries:
+                # Drop the oldest verification to stay bounded
+                oldest = min(self._entries, key=lambda key: self._entries[key][1])
+                del self._entries[oldest]
+            self._entries[fingerprint] = (user, time.monotonic())
+
+    def _revalidate(self, token, fingerprint):
+        try:
+            user = self.fetch_user(token)
+            # A 401 has already invalidated the entry through the client hook;
+            # other failures keep serving the last known identity.
+            if user:
+                with self._lock:
+                    if fingerprint in self._entries:
+                        self._entries[fingerprint] = (user, time.monotonic())
+        finally:
+            with self._lock:
+                self._refreshing.discard(fingerprint)
@@ -0,0 +1,110 @@
+"""Memory benchmark for cached project listings.
+
+Lists every project through a ``GitLabClient`` with a ``ResponseCache``,
+twice so the second pass decodes from the cache, and reports how many
+bytes each cached project costs. ``full`` asks for GitLab's full project
+objects and keeps them as dicts, which is how the dashboard worked before
+slotted records; ``slim`` asks for ``simple=true`` and keeps
+``ProjectRecord``s::
+
+    python memory_benchmark.py --projects 10000
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from benchmark import BENCH_TOKEN, start_mock_server
+from gitlab_client import GitLabClient
+from metrics import loads, orjson
+from mock_gitlab import MockConfig
+from records import ProjectRecord
+from response_cache import ResponseCache
+
+VARIANTS = {
+    'full': ({'membership': True}, None),
+    'slim': ({'membership': True, 'simple': True}, ProjectRecord.decode),
+}
+
+
+def measure(api_url, params, decoder, projects):
+    """Fill a fresh cache with the listing; returns byte counts for what it retains."""
+    gc.collect()
+    tracemalloc.start()
+    client = GitLabClient(api_url, cache=ResponseCache(max_entries=projects))
+    body_bytes = []
+    client.on_call(lambda method, path, response, elapsed, call: body_bytes.append(call['bytes']))
+    headers = {'Authorization': f'Bearer {BENCH_TOKEN}'}
+    baseline = tracemalloc.get_traced_memory()[0]
+    for _ in range(2):
+        listed = sum(1 for _ in client.paginate('/projects', headers=headers, params=params,
+                                                keyset=True, strict=True, decoder=decoder))
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    client.close()
+    return {
+        'projects': listed,
+        'cached_bytes': retained,
+        'bytes_per_project': round(retained / listed),
+        # Cache hits report no bytes, so this counts each page once
+        'body_bytes_per_project': round(sum(body_bytes) / listed),
+    }
+
+
+def fetch_bodies(api_url, params):
+    """Return the raw page bodies of the listing, for timing the parsers."""
+    client = GitLabClient(api_url)
+    bodies = []
+    client.on_call(lambda method, path, response, elapsed, call: bodies.append(response.content))
+    headers = {'Authorization': f'Bearer {BENCH_TOKEN}'}
+    for _ in client.paginate('/projects', headers=headers, params=params, keyset=True, strict=True):
+        pass
+    client.close()
+    return bodies
+
+
+def parse_seconds(bodies, parse, repeat=5):
+    """Best-of-``repeat`` time to parse every body."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for body in bodies:
+            parse(body)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--projects', type=int, default=10000)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    server, api_url = start_mock_server(MockConfig(projects=args.projects, max_per_page=100))
+    report = {}
+    for name, (params, decoder) in VARIANTS.items():
+        result = measure(api_url, params, decoder, args.projects)
+        bodies = fetch_bodies(api_url, params)
+        result['json_parse_ms'] = round(parse_seconds(bodies, json.loads) * 1000, 1)
+        if orjson is not None:
+            result['orjson_parse_ms'] = round(parse_seconds(bodies, loads) * 1000, 1)
+        report[name] = result
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    header = f"{'variant':<8}{'projects':>10}{'bytes/proj':>12}{'body/proj':>11}{'json ms':>9}{'orjson ms':>11}"
+    print(header)
+    print('-' * len(header))
+    for name, result in report.items():
+        print(f"{name:<8}{result['projects']:>10}{result['bytes_per_project']:>12}"
+              f"{result['body_bytes_per_project']:>11}{result['json_parse_ms']:>9.1f}"
+              f"{result.get('orjson_parse_ms', float('nan')):>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
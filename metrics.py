@@ -0,0 +1,321 @@
+"""Upstream call instrumentation, Prometheus export and Server-Timing headers."""
+import contextvars
+import cProfile
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import orjson
+except ImportError:  # optional; the standard library parser is used instead
+    orjson = None
+
+# Seconds; chosen around typical gitlab.com latencies
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Path segments that vary per resource and must not become label values
+_ID_SEGMENT = re.compile(r'^(\d+|[0-9a-f]{7,40}|[^/]*%2[Ff][^/]*)$')
+
+# Timings of the request currently being served; shared with worker threads
+# through contextvars.copy_context()
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+# Held while a request runs under cProfile; profilers cannot overlap on Python 3.12+
+_profiler_lock = threading.Lock()
+
+
+def endpoint_template(path):
+    """Collapse IDs, SHAs and encoded paths: ``/projects/42/repository/tree`` -> ``/projects/:id/repository/tree``."""
+    return '/'.join(':id' if _ID_SEGMENT.match(segment) else segment
+                    for segment in path.split('/'))
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by label values."""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0, 0.0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += 1
+            series[2] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, count, total) in sorted(self._series.items()):
+                label_text = _labels(self.label_names, labels)
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {bucket_count}')
+                lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {count}')
+                lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+                lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+
+class Counter:
+    """Monotonic counter keyed by label values."""
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{{{_labels(self.label_names, labels)}}} {value}")
+        return lines
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+upstream_requests = Counter(
+    'gitlab_upstream_requests_total',
+    'GitLab API calls by endpoint, status and cache outcome.',
+    ('method', 'endpoint', 'status', 'cache')
+)
+upstream_latency = Histogram(
+    'gitlab_upstream_request_duration_seconds',
+    'GitLab API call latency including retries and throttling.',
+    ('method', 'endpoint')
+)
+upstream_bytes = Counter(
+    'gitlab_upstream_response_bytes_total',
+    'Response body bytes received from GitLab.',
+    ('endpoint',)
+)
+upstream_retries = Counter(
+    'gitlab_upstream_retries_total',
+    'Retried GitLab API attempts.',
+    ('endpoint',)
+)
+route_latency = Histogram(
+    'app_request_duration_seconds',
+    'Flask route latency.',
+    ('route', 'status')
+)
+webhook_events = Counter(
+    'gitlab_webhook_events_total',
+    'GitLab webhook deliveries by event and outcome.',
+    ('event', 'outcome')
+)
+org_crawls = Counter(
+    'gitlab_org_crawls_total',
+    'Background organisation index crawls by kind and outcome.',
+    ('kind', 'outcome')
+)
+PROMETHEUS_METRICS = [upstream_requests, upstream_latency, upstream_bytes, upstream_retries, route_latency,
+                      webhook_events, org_crawls]
+
+
+class RequestTimings:
+    """Per-request time spent in upstream calls, JSON decoding and rendering."""
+
+    __slots__ = ('durations', 'upstream_calls', '_lock')
+
+    def __init__(self):
+        self.durations = {'upstream': 0.0, 'json': 0.0, 'render': 0.0}
+        self.upstream_calls = 0
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def add_upstream_call(self, seconds):
+        with self._lock:
+            self.durations['upstream'] += seconds
+            self.upstream_calls += 1
+
+    def server_timing(self, total):
+        desc = {'upstream': f'{self.upstream_calls} GitLab calls, summed', 'json': 'JSON decode',
+                'render': 'template render'}
+        parts = [f'{name};dur={seconds * 1000:.1f};desc="{desc.get(name, name)}"'
+                 for name, seconds in self.durations.items()]
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+@contextmanager
+def timed(name):
+    """Add the duration of the block to the current request's ``name`` timing."""
+    timings = _request_timings.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def loads(data):
+    """Parse a JSON document, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def decode_json(response, decoder=None):
+    """Decode a GitLab response body, counting the time as JSON decode.
+
+    ``decoder`` reshapes the parsed JSON, e.g. ``ProjectRecord.decode``.
+    Cached responses memoise the decoded form and then drop the body, so
+    only that shape stays in memory.
+    """
+    with timed('json'):
+        if getattr(response, 'from_cache', False):
+            return response.decoded(decoder)
+        data = loads(response.content)
+        return decoder(data) if decoder is not None else data
+
+
+def record_upstream(method, path, response, elapsed, call):
+    """``GitLabClient`` call observer: update metrics and the request's timings."""
+    endpoint = endpoint_template(path)
+    status = response.status_code if response is not None else 'error'
+    upstream_requests.inc((method, endpoint, str(status), call['cache']))
+    upstream_latency.observe((method, endpoint), elapsed)
+    if call['bytes']:
+        upstream_bytes.inc((endpoint,), call['bytes'])
+    if call['retries']:
+        upstream_retries.inc((endpoint,), call['retries'])
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.add_upstream_call(elapsed)
+
+
+def render_prometheus(extra_lines=()):
+    """Return every metric in Prometheus text exposition format."""
+    lines = []
+    for metric in PROMETHEUS_METRICS:
+        lines.extend(metric.render())
+    lines.extend(extra_lines)
+    return '\n'.join(lines) + '\n'
+
+
+def cache_metric_lines(stats):
+    """Render ``ResponseCache.stats()`` as Prometheus lines."""
+    lines = []
+    for key, value in stats.items():
+        kind = 'gauge' if key == 'entries' else 'counter'
+        name = f'gitlab_response_cache_{key}' + ('' if kind == 'gauge' else '_total')
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {value}")
+    return lines
+
+
+def _stop_profiler(g):
+    """Disable the request's profiler, if any, and let another request profile."""
+    profiler = g.pop('_profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profiler_lock.release()
+    return profiler
+
+
+def init_app(app, cache=None, profile_threshold_ms=None, profile_sample_rate=1.0,
+             profile_dir='profiles'):
+    """Install Server-Timing headers, the ``/metrics`` route and the slow-request profiler.
+
+    When ``profile_threshold_ms`` is set, a sampled fraction of requests runs
+    under cProfile and the profile is written to ``profile_dir`` if the
+    request took longer than the threshold. cProfile only sees the request
+    thread, so upstream calls show up as waits on their futures. Only one
+    request is profiled at a time: since Python 3.12 a second active
+    profiler raises ``ValueError``, so a sampled request that finds one
+    running is simply not profiled.
+    """
+    from flask import Response, before_render_template, g, request, template_rendered
+
+    @before_render_template.connect_via(app)
+    def _start_render(sender, template, context, **extra):
+        g._render_started = time.perf_counter()
+
+    @template_rendered.connect_via(app)
+    def _finish_render(sender, template, context, **extra):
+        started = g.pop('_render_started', None)
+        timings = _request_timings.get()
+        if started is not None and timings is not None:
+            timings.add('render', time.perf_counter() - started)
+
+    @app.before_request
+    def _start_timing():
+        g._timings_token = _request_timings.set(RequestTimings())
+        g._request_started = time.perf_counter()
+        if (profile_threshold_ms is not None and random.random() < profile_sample_rate
+                and _profiler_lock.acquire(blocking=False)):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler (a debugger, say) is already active
+                _profiler_lock.release()
+            else:
+                g._profiler = profiler
+
+    @app.after_request
+    def _finish_timing(response):
+        started = g.get('_request_started')
+        if started is None:
+            return response
+        total = time.perf_counter() - started
+        timings = _request_timings.get()
+        if request.endpoint != 'metrics' and timings is not None:
+            # A streamed body is produced after this runs, so its numbers would be wrong
+            if not response.is_streamed:
+                response.headers['Server-Timing'] = timings.server_timing(total)
+            route_latency.observe((request.endpoint or 'unknown', str(response.status_code)), total)
+
+        profiler = _stop_profiler(g)
+        if profiler is not None:
+            if total * 1000 >= profile_threshold_ms:
+                os.makedirs(profile_dir, exist_ok=True)
+                name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint}-{int(total * 1000)}ms.prof"
+                profiler.dump_stats(os.path.join(profile_dir, name))
+        return response
+
+    @app.teardown_request
+    def _reset_timing(exc):
+        # after_request is skipped when the view raises
+        _stop_profiler(g)
+        token = g.pop('_timings_token', None)
+        if token is not None:
+            _request_timings.reset(token)
+
+    @app.route('/metrics')
+    def metrics():
+        extra = cache_metric_lines(cache.stats()) if cache is not None else ()
+        return Response(render_prometheus(extra), mimetype='text/plain; version=0.0.4')
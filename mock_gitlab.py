@@ -0,0 +1,540 @@
+"""Local stand-in for the GitLab REST API, for benchmarks and offline development.
+
+Serves the endpoints used by app.py and streamlit_app.py from a synthetic,
+deterministic dataset, with configurable latency, page sizes, scale and
+rate limiting. Point the apps at it with::
+
+    python mock_gitlab.py --port 8929 --latency-ms 80
+    GITLAB_API_URL=http://127.0.0.1:8929/api/v4 python app.py
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from urllib.parse import urlencode
+
+from flask import Flask, Response, abort, g, request
+
+API_PREFIX = '/api/v4'
+
+# Fields GitLab returns for a project with ``simple=true``
+SIMPLE_PROJECT_FIELDS = (
+    'id', 'description', 'name', 'name_with_namespace', 'path', 'path_with_namespace',
+    'created_at', 'default_branch', 'tag_list', 'topics', 'ssh_url_to_repo', 'http_url_to_repo',
+    'web_url', 'readme_url', 'forks_count', 'avatar_url', 'star_count', 'last_activity_at',
+    'namespace',
+)
+
+
+@dataclass
+class MockConfig:
+    """Knobs for the mock server."""
+    latency_ms: float = 0
+    default_per_page: int = 20
+    max_per_page: int = 100
+    projects: int = 200
+    groups: int = 20
+    subgroups: int = 0  # subgroups under each top-level group
+    commits: int = 500
+    tree_dirs: int = 20
+    tree_files_per_dir: int = 25
+    issues: int = 50
+    merge_requests: int = 20
+    rate_limit: int = 0  # requests per window per token; 0 disables
+    rate_window: int = 60
+
+
+def _sha(*parts):
+    return hashlib.sha1('/'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+class MockDataset:
+    """Deterministic synthetic GitLab data sized by a ``MockConfig``."""
+
+    def __init__(self, config):
+        self.config = config
+        self.user = {
+            'id': 1,
+            'username': 'mock-user',
+            'name': 'Mock User',
+            'state': 'active',
+            'avatar_url': None,
+            'web_url': 'http://gitlab.mock/mock-user',
+        }
+        self.groups = [self._group(group_id) for group_id in range(1, config.groups + 1)]
+        for parent in list(self.groups):
+            for n in range(1, config.subgroups + 1):
+                self.groups.append(self._group(len(self.groups) + 1, parent, n))
+        self.projects = [self._project(project_id) for project_id in range(1, config.projects + 1)]
+        self.issues = {}
+        self._issue_lock = threading.Lock()
+
+    def _group(self, group_id, parent=None, n=None):
+        path = f'group-{group_id}' if parent is None else f'sub-{n}'
+        full_path = path if parent is None else f"{parent['full_path']}/{path}"
+        full_name = f'Group {group_id}' if parent is None else f"{parent['full_name']} / Sub {n}"
+        return {
+            'id': group_id,
+            'name': path,
+            'path': path,
+            'full_name': full_name,
+            'full_path': full_path,
+            'description': f'Synthetic group {group_id}',
+            'visibility': 'private',
+            'web_url': f'http://gitlab.mock/groups/{full_path}',
+            'avatar_url': None,
+            'parent_id': parent['id'] if parent else None,
+        }
+
+    def _project(self, project_id):
+        group = self.groups[(project_id - 1) % len(self.groups)] if self.groups else None
+        group_id = group['id'] if group else 1
+        full_path = group['full_path'] if group else f'group-{group_id}'
+        full_name = group['full_name'] if group else f'Group {group_id}'
+        path_with_namespace = f'{full_path}/project-{project_id}'
+        web_url = f'http://gitlab.mock/{path_with_namespace}'
+        api_url = f'http://gitlab.mock{API_PREFIX}/projects/{project_id}'
+        project = {
+            'id': project_id,
+            'name': f'project-{project_id}',
+            'name_with_namespace': f'{full_name} / project-{project_id}',
+            'path': f'project-{project_id}',
+            'path_with_namespace': path_with_namespace,
+            'description': f'Synthetic project {project_id} ' + 'lorem ipsum ' * 8,
+            'created_at': '2023-01-01T00:00:00.000Z',
+            'default_branch': 'main',
+            'tag_list': [],
+            'topics': [],
+            'ssh_url_to_repo': f'git@gitlab.mock:{path_with_namespace}.git',
+            'http_url_to_repo': f'{web_url}.git',
+            'web_url': web_url,
+            'readme_url': f'{web_url}/-/blob/main/README.md',
+            'forks_count': project_id % 5,
+            'avatar_url': None,
+            'star_count': project_id % 17,
+            'last_activity_at': '2024-01-01T00:00:00.000Z',
+            'namespace': {
+                'id': group_id, 'name': full_name, 'path': full_path.rsplit('/', 1)[-1], 'kind': 'group',
+                'full_path': full_path, 'parent_id': group['parent_id'] if group else None,
+                'avatar_url': None, 'web_url': f'http://gitlab.mock/groups/{full_path}',
+            },
+            'visibility': 'private',
+            # The rest of a full (non-simple) project object, which the apps never read
+            'container_registry_image_prefix': f'registry.gitlab.mock/{path_with_namespace}',
+            '_links': {
+                'self': api_url,
+                'issues': f'{api_url}/issues',
+                'merge_requests': f'{api_url}/merge_requests',
+                'repo_branches': f'{api_url}/repository/branches',
+                'labels': f'{api_url}/labels',
+                'events': f'{api_url}/events',
+                'members': f'{api_url}/members',
+                'cluster_agents': f'{api_url}/cluster_agents',
+            },
+            'packages_enabled': True,
+            'empty_repo': False,
+            'archived': False,
+            'resolve_outdated_diff_discussions': False,
+            'container_expiration_policy': {
+                'cadence': '1d', 'enabled': False, 'keep_n': 10, 'older_than': '90d',
+                'name_regex': '.*', 'name_regex_keep': None, 'next_run_at': '2024-01-02T00:00:00.000Z',
+            },
+            'repository_object_format': 'sha1',
+            'issues_enabled': True,
+            'merge_requests_enabled': True,
+            'wiki_enabled': True,
+            'jobs_enabled': True,
+            'snippets_enabled': True,
+            'container_registry_enabled': True,
+            'service_desk_enabled': False,
+            'can_create_merge_request_in': True,
+            'shared_runners_enabled': True,
+            'lfs_enabled': True,
+            'creator_id': 1,
+            'import_status': 'none',
+            'open_issues_count': project_id % 23,
+            'ci_default_git_depth': 20,
+            'ci_forward_deployment_enabled': True,
+            'ci_job_token_scope_enabled': False,
+            'ci_separated_caches': True,
+            'ci_allow_fork_pipelines_to_run_in_parent_project': True,
+            'public_jobs': True,
+            'build_timeout': 3600,
+            'auto_cancel_pending_pipelines': 'enabled',
+            'ci_config_path': '',
+            'shared_with_groups': [],
+            'only_allow_merge_if_pipeline_succeeds': False,
+            'allow_merge_on_skipped_pipeline': None,
+            'request_access_enabled': True,
+            'only_allow_merge_if_all_discussions_are_resolved': False,
+            'remove_source_branch_after_merge': True,
+            'printing_merge_request_link_enabled': True,
+            'merge_method': 'merge',
+            'squash_option': 'default_off',
+            'enforce_auth_checks_on_uploads': True,
+            'suggestion_commit_message': None,
+            'merge_commit_template': None,
+            'squash_commit_template': None,
+            'issue_branch_template': None,
+            'autoclose_referenced_issues': True,
+            'permissions': {
+                'project_access': {'access_level': 30, 'notification_level': 3},
+                'group_access': None,
+            },
+            '_group_id': group_id,
+        }
+        for feature in ('issues', 'repository', 'merge_requests', 'forking', 'wiki', 'builds',
+                        'snippets', 'pages', 'operations', 'analytics', 'container_registry',
+                        'security_and_compliance', 'releases', 'environments', 'feature_flags',
+                        'infrastructure', 'monitor', 'model_experiments', 'model_registry'):
+            project[f'{feature}_access_level'] = 'enabled'
+        return project
+
+    def descendant_ids(self, group_id):
+        """IDs of every group below ``group_id``."""
+        found = []
+        frontier = [group_id]
+        while frontier:
+            children = [g['id'] for g in self.groups if g['parent_id'] in frontier]
+            found.extend(children)
+            frontier = children
+        return found
+
+    def project(self, project_id):
+        if 1 <= project_id <= len(self.projects):
+            return self.projects[project_id - 1]
+        return None
+
+    def commits(self, project_id):
+        """Newest-first commit list for a project."""
+        count = self.config.commits
+        return [
+            {
+                'id': _sha(project_id, 'commit', n),
+                'short_id': _sha(project_id, 'commit', n)[:8],
+                'title': f'Commit {n}',
+                'message': f'Commit {n}\n\nSynthetic change.',
+                'author_name': f'Author {n % 7}',
+                'author_email': f'author{n % 7}@example.com',
+                'created_at': _timestamp(n),
+                'committed_date': _timestamp(n),
+                'parent_ids': [_sha(project_id, 'commit', n - 1)] if n else [],
+            }
+            for n in range(count - 1, -1, -1)
+        ]
+
+    def tree(self, project_id):
+        """Sorted ``(path, type, id, mode)`` entries for the head commit."""
+        entries = []
+        for d in range(self.config.tree_dirs):
+            directory = f'pkg{d}'
+            entries.append((directory, 'tree', _sha(project_id, directory), '040000'))
+            for f in range(self.config.tree_files_per_dir):
+                path = f'{directory}/module_{f}.py'
+                entries.append((path, 'blob', _sha(project_id, path), '100644'))
+        entries.append(('README.md', 'blob', _sha(project_id, 'README.md'), '100644'))
+        return sorted(entries)
+
+    def project_issues(self, project_id):
+        with self._issue_lock:
+            if project_id not in self.issues:
+                self.issues[project_id] = [
+                    self._issue(project_id, iid, f'Issue {iid}', '')
+                    for iid in range(1, self.config.issues + 1)
+                ]
+            return self.issues[project_id]
+
+    def create_issue(self, project_id, title, description):
+        issues = self.project_issues(project_id)
+        with self._issue_lock:
+            issue = self._issue(project_id, len(issues) + 1, title, description)
+            issues.append(issue)
+        return issue
+
+    def _issue(self, project_id, iid, title, description):
+        return {
+            'id': project_id * 100000 + iid,
+            'iid': iid,
+            'project_id': project_id,
+            'title': title,
+            'description': description,
+            'state': 'opened',
+            'created_at': _timestamp(iid),
+            'web_url': f'http://gitlab.mock/projects/{project_id}/issues/{iid}',
+        }
+
+
+def _timestamp(n):
+    return time.strftime('%Y-%m-%dT%H:%M:%S.000Z', time.gmtime(1700000000 + n * 3600))
+
+
+def create_mock_app(config=None):
+    """Build the mock GitLab Flask app. ``app.config['MOCK_STATS']`` counts calls per endpoint."""
+    config = config or MockConfig()
+    data = MockDataset(config)
+    app = Flask(__name__)
+    stats = Counter()
+    stats_lock = threading.Lock()
+    buckets = {}
+    app.config['MOCK_STATS'] = stats
+    app.config['MOCK_DATA'] = data
+
+    @app.before_request
+    def simulate_upstream():
+        if request.path.startswith('/__mock__'):
+            return None
+        template = request.url_rule.rule if request.url_rule else request.path
+        with stats_lock:
+            stats[f'{request.method} {template}'] += 1
+            stats['total'] += 1
+        if config.latency_ms:
+            time.sleep(config.latency_ms / 1000)
+        if not request.headers.get('Authorization') and not request.headers.get('PRIVATE-TOKEN'):
+            return _json({'message': '401 Unauthorized'}, 401)
+        if config.rate_limit:
+            return _rate_limit(buckets, stats_lock, config)
+        return None
+
+    @app.after_request
+    def add_rate_limit_headers(response):
+        remaining = g.get('rate_limit_remaining')
+        if remaining is not None:
+            response.headers['RateLimit-Limit'] = str(config.rate_limit)
+            response.headers['RateLimit-Remaining'] = str(remaining)
+            response.headers['RateLimit-Reset'] = str(int(g.rate_limit_reset))
+        return response
+
+    @app.route('/__mock__/stats')
+    def mock_stats():
+        with stats_lock:
+            return _json(dict(stats))
+
+    @app.route('/__mock__/reset', methods=['POST'])
+    def mock_reset():
+        with stats_lock:
+            stats.clear()
+        return _json({'ok': True})
+
+    @app.route(f'{API_PREFIX}/user')
+    def user():
+        return _json(data.user)
+
+    @app.route(f'{API_PREFIX}/projects')
+    def projects():
+        return _paginated(_active_after(data.projects), config, view=_project_view())
+
+    @app.route(f'{API_PREFIX}/projects/<int:project_id>')
+    def project(project_id):
+        found = data.project(project_id)
+        if found is None:
+            abort(404)
+        return _json(_public([found])[0])
+
+    @app.route(f'{API_PREFIX}/groups')
+    def groups():
+        return _paginated(data.groups, config)
+
+    @app.route(f'{API_PREFIX}/groups/<int:group_id>/descendant_groups')
+    def descendant_groups(group_id):
+        if not 1 <= group_id <= len(data.groups):
+            abort(404)
+        descendants = set(data.descendant_ids(group_id))
+        return _paginated([g for g in data.groups if g['id'] in descendants], config)
+
+    @app.route(f'{API_PREFIX}/groups/<int:group_id>/projects')
+    def group_projects(group_id):
+        if not 1 <= group_id <= len(data.groups):
+            abort(404)
+        group_ids = {group_id}
+        if request.args.get('include_subgroups') in ('true', 'True', '1'):
+            group_ids.update(data.descendant_ids(group_id))
+        members = [p for p in _active_after(data.projects) if p['_group_id'] in group_ids]
+        return _paginated(members, config, view=_project_view())
+
+    @app.route(f'{API_PREFIX}/projects/<int:project_id>/repository/tree')
+    def tree(project_id):
+        if data.project(project_id) is None:
+            abort(404)
+        path = request.args.get('path', '').strip('/')
+        recursive = request.args.get('recursive', '').lower() in ('true', '1')
+        rows = []
+        for entry_path, entry_type, entry_id, mode in data.tree(project_id):
+            parent = entry_path.rsplit('/', 1)[0] if '/' in entry_path else ''
+            inside = entry_path.startswith(path + '/') if path else True
+            if (recursive and inside) or parent == path:
+                rows.append({
+                    'id': entry_id,
+                    'name': entry_path.rsplit('/', 1)[-1],
+                    'type': entry_type,
+                    'path': entry_path,
+                    'mode': mode,
+                })
+        return _paginated(rows, config, cursor_key='path')
+
+    @app.route(f'{API_PREFIX}/projects/<int:project_id>/repository/commits')
+    def commits(project_id):
+        if data.project(project_id) is None:
+            abort(404)
+        rows = data.commits(project_id)
+        since = request.args.get('since')
+        if since:
+            since = datetime.fromisoformat(since)
+            rows = [c for c in rows if datetime.fromisoformat(c['committed_date']) >= since]
+        return _paginated(rows, config, keyset=False)
+
+    @app.route(f'{API_PREFIX}/projects/<int:project_id>/repository/commits/<sha>')
+    def commit(project_id, sha):
+        for row in data.commits(project_id):
+            if row['id'] == sha or row['short_id'] == sha:
+                return _json(row)
+        abort(404)
+
+    @app.route(f'{API_PREFIX}/projects/<int:project_id>/issues', methods=['GET', 'POST'])
+    def issues(project_id):
+        if data.project(project_id) is None:
+            abort(404)
+        if request.method == 'POST':
+            body = request.get_json(silent=True) or request.form
+            if not body.get('title'):
+                return _json({'message': 'title is missing'}, 400)
+            return _json(data.create_issue(project_id, body['title'], body.get('description', '')), 201)
+        rows = data.project_issues(project_id)
+        search = request.args.get('search')
+        if search:
+            rows = [i for i in rows if search in i['title'] or search in (i['description'] or '')]
+        return _paginated(list(reversed(rows)), config, keyset=False)
+
+    @app.route(f'{API_PREFIX}/projects/<int:project_id>/merge_requests')
+    def merge_requests(project_id):
+        if data.project(project_id) is None:
+            abort(404)
+        rows = [
+            {
+                'id': project_id * 100000 + iid,
+                'iid': iid,
+                'project_id': project_id,
+                'title': f'Merge request {iid}',
+                'state': 'opened',
+                'source_branch': f'feature-{iid}',
+                'target_branch': 'main',
+            }
+            for iid in range(config.merge_requests, 0, -1)
+        ]
+        return _paginated(rows, config, keyset=False)
+
+    return app
+
+
+def _active_after(projects):
+    """Apply the ``last_activity_after`` filter, comparing ISO 8601 strings."""
+    after = request.args.get('last_activity_after')
+    if not after:
+        return projects
+    return [p for p in projects if p['last_activity_at'] > after]
+
+
+def _project_view():
+    """Row formatter for project listings, honouring ``simple=true``."""
+    simple = request.args.get('simple') in ('true', 'True', '1')
+    return lambda projects: _public(projects, simple)
+
+
+def _public(projects, simple=False):
+    """Strip the mock's private bookkeeping keys, or everything ``simple=true`` omits."""
+    if simple:
+        return [{k: p[k] for k in SIMPLE_PROJECT_FIELDS} for p in projects]
+    return [{k: v for k, v in p.items() if not k.startswith('_') or k == '_links'} for p in projects]
+
+
+def _json(payload, status=200, headers=None):
+    body = json.dumps(payload)
+    response = Response(body, status=status, mimetype='application/json', headers=headers)
+    if status == 200:
+        etag = '"%s"' % hashlib.md5(body.encode()).hexdigest()
+        response.headers['ETag'] = f'W/{etag}'
+        if request.headers.get('If-None-Match') == f'W/{etag}':
+            return Response(status=304, headers={'ETag': f'W/{etag}'})
+    return response
+
+
+def _rate_limit(buckets, lock, config):
+    """Fixed-window limiter keyed by token; returns a 429 response when exhausted."""
+    token = request.headers.get('Authorization') or request.headers.get('PRIVATE-TOKEN')
+    now = time.time()
+    with lock:
+        window_start, used = buckets.get(token, (now, 0))
+        if now - window_start >= config.rate_window:
+            window_start, used = now, 0
+        used += 1
+        buckets[token] = (window_start, used)
+    reset = window_start + config.rate_window
+    g.rate_limit_remaining = max(config.rate_limit - used, 0)
+    g.rate_limit_reset = reset
+    if used > config.rate_limit:
+        return _json({'message': '429 Too Many Requests'}, 429,
+                     headers={'Retry-After': str(max(int(reset - now), 1))})
+    return None
+
+
+def _paginated(rows, config, keyset=True, cursor_key='id', view=None):
+    """Return one page of ``rows`` with GitLab's pagination headers.
+
+    Offset pagination sets ``X-Page``/``X-Next-Page``/``X-Total-Pages`` and a
+    ``Link`` header. With ``pagination=keyset`` only a ``Link`` header with a
+    cursor is sent, like GitLab does. ``view`` formats the page's rows just
+    before they are serialised.
+    """
+    per_page = min(int(request.args.get('per_page', config.default_per_page)), config.max_per_page)
+    base_args = {k: v for k, v in request.args.items()
+                 if k not in ('page', 'id_after', 'page_token')}
+    base_url = request.base_url
+
+    if keyset and request.args.get('pagination') == 'keyset':
+        cursor = request.args.get('page_token' if cursor_key == 'path' else 'id_after')
+        if cursor is not None:
+            if cursor_key == 'id':
+                cursor = int(cursor)
+            rows = list(itertools.dropwhile(lambda row: row[cursor_key] <= cursor, rows))
+        page_rows = rows[:per_page]
+        headers = {}
+        if len(rows) > per_page:
+            next_args = dict(base_args)
+            next_args['page_token' if cursor_key == 'path' else 'id_after'] = page_rows[-1][cursor_key]
+            headers['Link'] = f'<{base_url}?{urlencode(next_args)}>; rel="next"'
+        return _json(view(page_rows) if view else page_rows, headers=headers)
+
+    page = max(int(request.args.get('page', 1)), 1)
+    total_pages = max(-(-len(rows) // per_page), 1)
+    page_rows = rows[(page - 1) * per_page:page * per_page]
+    headers = {
+        'X-Page': str(page),
+        'X-Per-Page': str(per_page),
+        'X-Total': str(len(rows)),
+        'X-Total-Pages': str(total_pages),
+    }
+    if page < total_pages:
+        headers['X-Next-Page'] = str(page + 1)
+        headers['Link'] = f'<{base_url}?{urlencode({**base_args, "page": page + 1})}>; rel="next"'
+    return _json(view(page_rows) if view else page_rows, headers=headers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8929)
+    defaults = MockConfig()
+    for field, spec in MockConfig.__dataclass_fields__.items():
+        # The annotation, not the default's type: latency_ms defaults to 0 but takes 12.5
+        parser.add_argument(f"--{field.replace('_', '-')}", type=spec.type, default=getattr(defaults, field))
+    args = parser.parse_args()
+    config = MockConfig(**{field: getattr(args, field) for field in MockConfig.__dataclass_fields__})
+    create_mock_app(config).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,368 @@
+"""Local SQLite inventory of every group and project a token can reach.
+
+``OrgCrawler`` walks each group hierarchy in the background and writes
+groups, projects and per-token visibility into an ``OrgIndex``. The index
+answers dashboard listings and full-text search without calling GitLab.
+"""
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import org_crawls
+from records import GroupRecord, ProjectRecord
+from response_cache import token_fingerprint
+
+SCHEMA = """
+PRAGMA journal_mode = WAL;
+
+CREATE TABLE IF NOT EXISTS groups (
+    id INTEGER PRIMARY KEY,
+    parent_id INTEGER,
+    name TEXT NOT NULL,
+    full_name TEXT,
+    full_path TEXT NOT NULL,
+    description TEXT,
+    web_url TEXT,
+    avatar_url TEXT,
+    visibility TEXT
+);
+CREATE INDEX IF NOT EXISTS groups_parent ON groups (parent_id);
+
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    namespace_id INTEGER,
+    name TEXT NOT NULL,
+    name_with_namespace TEXT,
+    path_with_namespace TEXT NOT NULL,
+    description TEXT,
+    web_url TEXT,
+    avatar_url TEXT,
+    default_branch TEXT,
+    visibility TEXT,
+    star_count INTEGER,
+    last_activity_at TEXT
+);
+CREATE INDEX IF NOT EXISTS projects_namespace ON projects (namespace_id);
+
+-- Which token saw which record, so one user's crawl never leaks into another's results
+CREATE TABLE IF NOT EXISTS access (
+    fingerprint TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    PRIMARY KEY (fingerprint, kind, id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS crawls (
+    fingerprint TEXT PRIMARY KEY,
+    started_at REAL NOT NULL,
+    finished_at REAL NOT NULL,
+    full_at REAL NOT NULL
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS projects_fts USING fts5(
+    name, path_with_namespace, description, content='projects', content_rowid='id'
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS groups_fts USING fts5(
+    name, full_path, description, content='groups', content_rowid='id'
+);
+
+CREATE TRIGGER IF NOT EXISTS projects_ai AFTER INSERT ON projects BEGIN
+    INSERT INTO projects_fts (rowid, name, path_with_namespace, description)
+    VALUES (new.id, new.name, new.path_with_namespace, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS projects_ad AFTER DELETE ON projects BEGIN
+    INSERT INTO projects_fts (projects_fts, rowid, name, path_with_namespace, description)
+    VALUES ('delete', old.id, old.name, old.path_with_namespace, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS projects_au AFTER UPDATE ON projects BEGIN
+    INSERT INTO projects_fts (projects_fts, rowid, name, path_with_namespace, description)
+    VALUES ('delete', old.id, old.name, old.path_with_namespace, old.description);
+    INSERT INTO projects_fts (rowid, name, path_with_namespace, description)
+    VALUES (new.id, new.name, new.path_with_namespace, new.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS groups_ai AFTER INSERT ON groups BEGIN
+    INSERT INTO groups_fts (rowid, name, full_path, description)
+    VALUES (new.id, new.name, new.full_path, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS groups_ad AFTER DELETE ON groups BEGIN
+    INSERT INTO groups_fts (groups_fts, rowid, name, full_path, description)
+    VALUES ('delete', old.id, old.name, old.full_path, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS groups_au AFTER UPDATE ON groups BEGIN
+    INSERT INTO groups_fts (groups_fts, rowid, name, full_path, description)
+    VALUES ('delete', old.id, old.name, old.full_path, old.description);
+    INSERT INTO groups_fts (rowid, name, full_path, description)
+    VALUES (new.id, new.name, new.full_path, new.description);
+END;
+"""
+
+PROJECT_COLUMNS = ProjectRecord.__slots__
+GROUP_COLUMNS = GroupRecord.__slots__
+
+# GitLab only bumps last_activity_at about once an hour, so incremental
+# crawls look back further than the time since the previous crawl
+ACTIVITY_OVERLAP = 2 * 3600
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def _upsert_sql(table, columns):
+    updates = ', '.join(f'{column} = excluded.{column}' for column in columns[1:])
+    return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+            f"ON CONFLICT (id) DO UPDATE SET {updates}")
+
+
+def project_row(project):
+    return ProjectRecord.from_json(project).astuple()
+
+
+def group_row(group):
+    return GroupRecord.from_json(group).astuple()
+
+
+def match_query(text):
+    """Turn free text into an FTS5 query: every word must match as a prefix."""
+    return ' '.join(f'"{word}"*' for word in _WORD.findall(text))
+
+
+class OrgIndex:
+    """SQLite store for crawled groups and projects, searchable through FTS5.
+
+    Each thread gets its own connection; WAL mode lets dashboard reads run
+    while a crawl is writing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        # Fingerprint -> when its access was last revoked; crawls started earlier are stale
+        self._forgotten = {}
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+        return connection
+
+    def store(self, fingerprint, groups=(), projects=()):
+        """Upsert groups and projects and record that ``fingerprint`` can see them."""
+        groups = [group_row(group) for group in groups]
+        projects = [project_row(project) for project in projects]
+        access = ([(fingerprint, 'group', row[0]) for row in groups]
+                  + [(fingerprint, 'project', row[0]) for row in projects])
+        with self._write_lock, self._connect() as connection:
+            connection.executemany(_upsert_sql('groups', GROUP_COLUMNS), groups)
+            connection.executemany(_upsert_sql('projects', PROJECT_COLUMNS), projects)
+            connection.executemany('INSERT OR IGNORE INTO access VALUES (?, ?, ?)', access)
+
+    def prune(self, fingerprint, kind, keep_ids):
+        """Drop ``fingerprint``'s access to every ``kind`` record not in ``keep_ids``."""
+        with self._write_lock, self._connect() as connection:
+            connection.execute('CREATE TEMP TABLE IF NOT EXISTS keep (id INTEGER PRIMARY KEY)')
+            connection.execute('DELETE FROM keep')
+            connection.executemany('INSERT OR IGNORE INTO keep VALUES (?)', ((i,) for i in keep_ids))
+            connection.execute(
+                'DELETE FROM access WHERE fingerprint = ? AND kind = ? AND id NOT IN (SELECT id FROM keep)',
+                (fingerprint, kind)
+            )
+
+    def remove_project(self, project_id):
+        """Forget a deleted project for every token."""
+        with self._write_lock, self._connect() as connection:
+            connection.execute("DELETE FROM access WHERE kind = 'project' AND id = ?", (project_id,))
+            connection.execute('DELETE FROM projects WHERE id = ?', (project_id,))
+
+    def forget(self, fingerprint):
+        """Drop everything ``fingerprint`` was seen to access, e.g. after a membership change.
+
+        The token reads as not crawled until a new full crawl finishes, and a
+        crawl already running is not recorded. Returns the access rows dropped.
+        """
+        with self._write_lock, self._connect() as connection:
+            self._forgotten[fingerprint] = time.time()
+            connection.execute('DELETE FROM crawls WHERE fingerprint = ?', (fingerprint,))
+            return connection.execute('DELETE FROM access WHERE fingerprint = ?', (fingerprint,)).rowcount
+
+    def crawl_state(self, fingerprint):
+        """Return the last crawl's ``started_at``/``finished_at``/``full_at``, or None."""
+        row = self._connect().execute(
+            'SELECT started_at, finished_at, full_at FROM crawls WHERE fingerprint = ?', (fingerprint,)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def record_crawl(self, fingerprint, started_at, full):
+        with self._write_lock, self._connect() as connection:
+            if started_at <= self._forgotten.get(fingerprint, 0):
+                # Access changed mid-crawl; the next full crawl prunes what it stored
+                return
+            previous = connection.execute(
+                'SELECT full_at FROM crawls WHERE fingerprint = ?', (fingerprint,)
+            ).fetchone()
+            full_at = started_at if full or previous is None else previous['full_at']
+            connection.execute(
+                'INSERT OR REPLACE INTO crawls VALUES (?, ?, ?, ?)',
+                (fingerprint, started_at, time.time(), full_at)
+            )
+
+    def projects(self, fingerprint, limit=None):
+        """Projects visible to ``fingerprint``, most recently active first."""
+        return self._rows(
+            ProjectRecord,
+            "SELECT p.* FROM projects p JOIN access a ON a.kind = 'project' AND a.id = p.id "
+            'WHERE a.fingerprint = ? ORDER BY p.last_activity_at DESC, p.id LIMIT ?',
+            (fingerprint, -1 if limit is None else limit)
+        )
+
+    def groups(self, fingerprint, limit=None):
+        """Groups visible to ``fingerprint``, ordered by full path."""
+        return self._rows(
+            GroupRecord,
+            "SELECT g.* FROM groups g JOIN access a ON a.kind = 'group' AND a.id = g.id "
+            'WHERE a.fingerprint = ? ORDER BY g.full_path LIMIT ?',
+            (fingerprint, -1 if limit is None else limit)
+        )
+
+    def search(self, fingerprint, text, limit=50):
+        """Return ``(projects, groups)`` whose name, path or description match ``text``."""
+        query = match_query(text)
+        if not query:
+            return [], []
+        projects = self._rows(
+            ProjectRecord,
+            "SELECT p.* FROM projects_fts f JOIN projects p ON p.id = f.rowid "
+            "JOIN access a ON a.kind = 'project' AND a.id = p.id AND a.fingerprint = ? "
+            'WHERE projects_fts MATCH ? ORDER BY bm25(projects_fts, 10.0, 5.0, 1.0) LIMIT ?',
+            (fingerprint, query, limit)
+        )
+        groups = self._rows(
+            GroupRecord,
+            "SELECT g.* FROM groups_fts f JOIN groups g ON g.id = f.rowid "
+            "JOIN access a ON a.kind = 'group' AND a.id = g.id AND a.fingerprint = ? "
+            'WHERE groups_fts MATCH ? ORDER BY bm25(groups_fts, 10.0, 5.0, 1.0) LIMIT ?',
+            (fingerprint, query, limit)
+        )
+        return projects, groups
+
+    def _rows(self, record, sql, params):
+        return [record(**row) for row in self._connect().execute(sql, params)]
+
+
+class OrgCrawler:
+    """Crawls every group hierarchy a token can see into an ``OrgIndex``.
+
+    Root groups are crawled ``max_workers`` at a time; each lists its
+    descendant groups and, with ``include_subgroups``, every project below
+    it. Projects the user is a direct member of are listed too, to pick up
+    personal namespaces. The client's rate limiter paces all of it.
+    Re-crawls only ask for projects active since the previous crawl; a full
+    crawl every ``full_recrawl_after`` seconds prunes deleted and moved
+    records.
+    """
+
+    def __init__(self, client, index, max_workers=4, recrawl_after=900, full_recrawl_after=86400):
+        self.client = client
+        self.index = index
+        self.recrawl_after = recrawl_after
+        self.full_recrawl_after = full_recrawl_after
+        self._workers = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='org-crawl')
+        # Crawls run one at a time so several users cannot multiply the load
+        self._scheduler = ThreadPoolExecutor(max_workers=1, thread_name_prefix='org-crawl-scheduler')
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def is_ready(self, headers):
+        """Return True once a crawl has completed for these credentials."""
+        return self.index.crawl_state(token_fingerprint(headers)) is not None
+
+    def ensure_fresh(self, headers):
+        """Schedule a background crawl if the token's index is missing or stale."""
+        fingerprint = token_fingerprint(headers)
+        state = self.index.crawl_state(fingerprint)
+        now = time.time()
+        if state is not None and now - state['finished_at'] < self.recrawl_after:
+            return None
+        full = state is None or now - state['full_at'] >= self.full_recrawl_after
+        with self._lock:
+            if fingerprint in self._pending:
+                return None
+            self._pending.add(fingerprint)
+        return self._scheduler.submit(self._crawl_once, fingerprint, dict(headers), full, state)
+
+    def crawl(self, headers, full=True):
+        """Crawl now in the calling thread; returns ``(group_count, project_count)``."""
+        fingerprint = token_fingerprint(headers)
+        return self._crawl(fingerprint, headers, full, self.index.crawl_state(fingerprint))
+
+    def _crawl_once(self, fingerprint, headers, full, state):
+        kind = 'full' if full else 'incremental'
+        try:
+            result = self._crawl(fingerprint, headers, full, state)
+            org_crawls.inc((kind, 'ok'))
+            return result
+        except Exception:
+            # Keep serving the previous index; the next page view retries
+            org_crawls.inc((kind, 'failed'))
+            raise
+        finally:
+            with self._lock:
+                self._pending.discard(fingerprint)
+
+    def _crawl(self, fingerprint, headers, full, state):
+        started_at = time.time()
+        activity_params = {}
+        if not full and state is not None:
+            since = time.gmtime(state['started_at'] - ACTIVITY_OVERLAP)
+            activity_params['last_activity_after'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', since)
+
+        groups = list(self.client.paginate("/groups", headers=headers, strict=True))
+        known = {group['id'] for group in groups}
+        roots = [group for group in groups if group.get('parent_id') not in known]
+        self.index.store(fingerprint, groups=groups)
+
+        group_ids = set(known)
+        project_ids = set()
+
+        def crawl_root(group):
+            descendants = list(self.client.paginate(
+                f"/groups/{group['id']}/descendant_groups", headers=headers, strict=True
+            ))
+            projects = list(self.client.paginate(
+                f"/groups/{group['id']}/projects",
+                headers=headers,
+                params={'include_subgroups': True, 'with_shared': False, **activity_params},
+                strict=True
+            ))
+            self.index.store(fingerprint, groups=descendants, projects=projects)
+            return descendants, projects
+
+        def crawl_memberships():
+            projects = list(self.client.paginate(
+                "/projects",
+                headers=headers,
+                params={'membership': True, **activity_params},
+                keyset=True,
+                strict=True
+            ))
+            self.index.store(fingerprint, projects=projects)
+            return [], projects
+
+        futures = [self._workers.submit(crawl_root, group) for group in roots]
+        futures.append(self._workers.submit(crawl_memberships))
+        # result() re-raises, so a failed listing never counts as a complete crawl
+        for future in futures:
+            descendants, projects = future.result()
+            group_ids.update(group['id'] for group in descendants)
+            project_ids.update(project['id'] for project in projects)
+
+        if full:
+            self.index.prune(fingerprint, 'group', group_ids)
+            self.index.prune(fingerprint, 'project', project_ids)
+        self.index.record_crawl(fingerprint, started_at, full)
+        return len(group_ids), len(project_ids)
@@ -0,0 +1,81 @@
+"""Compact, slotted records for the GitLab objects the app keeps in memory.
+
+Each record holds only the fields the templates, the organisation index and
+the Streamlit tables read. GitLab's full objects carry dozens of nested
+fields that are never used. Records support attribute access, so templates
+written against the JSON dicts (``project.name``) work unchanged.
+"""
+
+
+class Record:
+    """Base class: ``__slots__`` doubles as the list of fields kept."""
+
+    __slots__ = ()
+
+    def __init__(self, *args, **kwargs):
+        for name, value in zip(self.__slots__, args):
+            setattr(self, name, value)
+        for name in self.__slots__[len(args):]:
+            setattr(self, name, kwargs.get(name))
+
+    @classmethod
+    def from_json(cls, data):
+        """Build a record from a GitLab JSON object, dropping every other field."""
+        return cls(*(data.get(name) for name in cls.__slots__))
+
+    @classmethod
+    def decode(cls, data):
+        """Convert a decoded JSON list or object; usable as a ``decode_json`` decoder."""
+        if isinstance(data, list):
+            return [cls.from_json(item) for item in data]
+        return cls.from_json(data)
+
+    def get(self, name, default=None):
+        """Dict-style read, for code that still treats records as JSON objects."""
+        return getattr(self, name, default)
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def astuple(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def asdict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __eq__(self, other):
+        return type(other) is type(self) and other.astuple() == self.astuple()
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+
+
+class ProjectRecord(Record):
+    __slots__ = ('id', 'namespace_id', 'name', 'name_with_namespace', 'path_with_namespace',
+                 'description', 'web_url', 'avatar_url', 'default_branch', 'visibility',
+                 'star_count', 'last_activity_at')
+
+    @classmethod
+    def from_json(cls, data):
+        namespace = data.get('namespace') or {}
+        return cls(data['id'], namespace.get('id'), data.get('name'), data.get('name_with_namespace'),
+                   data.get('path_with_namespace'), data.get('description'), data.get('web_url'),
+                   data.get('avatar_url'), data.get('default_branch'), data.get('visibility'),
+                   data.get('star_count'), data.get('last_activity_at'))
+
+
+class GroupRecord(Record):
+    __slots__ = ('id', 'parent_id', 'name', 'full_name', 'full_path', 'description',
+                 'web_url', 'avatar_url', 'visibility')
+
+
+class TreeEntry(Record):
+    __slots__ = ('id', 'name', 'type', 'path', 'mode')
+
+
+class CommitRecord(Record):
+    __slots__ = ('id', 'short_id', 'author_name', 'message', 'created_at', 'committed_date')
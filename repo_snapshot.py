@@ -0,0 +1,195 @@
+"""Bulk repository snapshots streamed from GitLab's archive endpoint."""
+import os
+import posixpath
+import tarfile
+import tempfile
+from fnmatch import fnmatchcase
+
+# Source and text files worth keeping for diagram generation
+DEFAULT_INCLUDE = (
+    '*.py', '*.js', '*.jsx', '*.ts', '*.tsx', '*.java', '*.kt', '*.go', '*.rb',
+    '*.rs', '*.c', '*.h', '*.cpp', '*.hpp', '*.cs', '*.php', '*.swift', '*.scala',
+    '*.sql', '*.proto', '*.graphql', '*.md', '*.json', '*.yml', '*.yaml', '*.toml',
+    'Dockerfile', 'Makefile',
+)
+DEFAULT_EXCLUDE = ('node_modules/*', '*/node_modules/*', 'vendor/*', '*.min.js')
+DEFAULT_MAX_FILE_SIZE = 512 * 1024
+
+# Bytes sniffed to decide whether a file is text
+TEXT_SNIFF_BYTES = 8192
+
+
+def matches(path, patterns):
+    """Return True if ``path`` matches any glob; slash-free globs match the basename."""
+    name = posixpath.basename(path)
+    return any(
+        fnmatchcase(path, pattern) or ('/' not in pattern and fnmatchcase(name, pattern))
+        for pattern in patterns
+    )
+
+
+def is_text(data):
+    """Heuristically decide whether ``data`` is UTF-8 text."""
+    sample = data[:TEXT_SNIFF_BYTES]
+    if b'\0' in sample:
+        return False
+    try:
+        sample.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off by the sniff window is still text
+        return e.start >= len(sample) - 3
+    return True
+
+
+class BlobStore:
+    """Content-addressed on-disk store keyed by git blob SHA.
+
+    Blobs that were seen but rejected (binary, too large, or absent from
+    the archive) are remembered too, so later snapshots do not download them
+    again. A size rejection records the blob's size, so raising the limit
+    fetches it after all.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(os.path.join(root, 'objects'), exist_ok=True)
+        os.makedirs(os.path.join(root, 'skipped'), exist_ok=True)
+
+    def path(self, blob_id):
+        return os.path.join(self.root, 'objects', blob_id[:2], blob_id[2:])
+
+    def _skip_path(self, blob_id):
+        return os.path.join(self.root, 'skipped', blob_id)
+
+    def has(self, blob_id):
+        return os.path.exists(self.path(blob_id))
+
+    def known(self, blob_id, max_file_size=None):
+        """Return True if the blob is stored or was rejected for a reason that still holds."""
+        if self.has(blob_id):
+            return True
+        try:
+            with open(self._skip_path(blob_id)) as f:
+                reason = f.read()
+        except FileNotFoundError:
+            return False
+        if reason.startswith('size '):
+            return max_file_size is None or int(reason[len('size '):]) > max_file_size
+        # Markers written before reasons were recorded don't say why; fetch again
+        return bool(reason)
+
+    def put(self, blob_id, data):
+        """Write a blob atomically; existing blobs are left untouched."""
+        path = self.path(blob_id)
+        if os.path.exists(path):
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def skip(self, blob_id, reason):
+        """Remember that a blob was rejected: ``'binary'``, ``'absent'`` or ``'size <bytes>'``."""
+        with open(self._skip_path(blob_id), 'w') as f:
+            f.write(reason)
+
+    def read(self, blob_id):
+        with open(self.path(blob_id), 'rb') as f:
+            return f.read()
+
+
+class RepositorySnapshotter:
+    """Materialises filtered repository contents into a ``BlobStore``.
+
+    The tree index says which blobs a commit contains. Only blobs the store
+    has never seen are fetched, by streaming ``/repository/archive.tar.gz``
+    and decompressing it on the fly, so neither the archive nor unwanted
+    files are ever held in memory.
+    """
+
+    def __init__(self, client, tree_indexer, store):
+        self.client = client
+        self.tree_indexer = tree_indexer
+        self.store = store
+
+    def snapshot(self, project_id, ref=None, headers=None, include=DEFAULT_INCLUDE,
+                 exclude=DEFAULT_EXCLUDE, max_file_size=DEFAULT_MAX_FILE_SIZE):
+        """Return a ``{path: blob_id}`` manifest of stored files for ``ref``.
+
+        Returns None if the tree cannot be indexed or the archive download fails.
+        """
+        index = self.tree_indexer.get_index(project_id, ref, headers=headers)
+        if index is None:
+            return None
+
+        wanted = {
+            path: blob_id
+            for path, blob_id in index.blobs()
+            if matches(path, include) and not matches(path, exclude)
+        }
+        missing = {path: blob_id for path, blob_id in wanted.items()
+                   if not self.store.known(blob_id, max_file_size)}
+        if missing and not self._download(project_id, index.sha, missing, headers, max_file_size):
+            return None
+
+        return {path: blob_id for path, blob_id in wanted.items() if self.store.has(blob_id)}
+
+    def _download(self, project_id, sha, missing, headers, max_file_size):
+        """Stream the archive and store the ``missing`` blobs.
+
+        Symlinks and ``export-ignore`` paths are listed as blobs in the tree
+        but never arrive as regular files; after a complete download they
+        are recorded as absent so they do not trigger another one.
+        """
+        params = {'sha': sha}
+        prefix = _common_directory(missing)
+        if prefix:
+            params['path'] = prefix
+
+        response = self.client.get(
+            f"/projects/{project_id}/repository/archive.tar.gz",
+            headers=headers,
+            params=params,
+            stream=True
+        )
+        seen = set()
+        try:
+            if response.status_code != 200:
+                return False
+            response.raw.decode_content = True
+            with tarfile.open(fileobj=response.raw, mode='r|gz') as archive:
+                for member in archive:
+                    if not member.isfile():
+                        continue
+                    # Archive members are prefixed with "<project>-<sha>/"
+                    path = member.name.split('/', 1)[-1]
+                    blob_id = missing.get(path)
+                    if blob_id is None and prefix:
+                        blob_id = missing.get(f"{prefix}/{path}")
+                    if blob_id is None:
+                        continue
+                    seen.add(blob_id)
+                    if member.size > max_file_size:
+                        self.store.skip(blob_id, f'size {member.size}')
+                        continue
+                    data = archive.extractfile(member).read()
+                    if not is_text(data):
+                        self.store.skip(blob_id, 'binary')
+                        continue
+                    self.store.put(blob_id, data)
+        except (tarfile.TarError, OSError):
+            return False
+        finally:
+            response.close()
+        for blob_id in set(missing.values()) - seen:
+            self.store.skip(blob_id, 'absent')
+        return True
+
+
+def _common_directory(paths):
+    """Return the deepest directory containing every path, or '' for the root."""
+    directories = {posixpath.dirname(path) for path in paths}
+    if '' in directories:
+        return ''
+    return posixpath.commonpath(directories)
@@ -0,0 +1,251 @@
+"""Size-bounded LRU cache for GitLab GET responses with ETag revalidation."""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from urllib.parse import urlsplit
+
+from requests.structures import CaseInsensitiveDict
+
+from metrics import loads
+
+# Seconds a cached response is served without revalidation, by API path pattern.
+# Patterns are matched in order; anything unmatched uses the cache default.
+# ``/user`` is always revalidated: it is how identity checks learn that a
+# token was revoked, and a 304 keeps that cheap.
+DEFAULT_TTLS = {
+    '/user': 0,
+    '/projects': 60,
+    '/groups': 60,
+    '/groups/*/projects': 60,
+    '/projects/*/repository/tree': 120,
+    '/projects/*': 120,
+}
+
+# TTLs for when GitLab webhooks invalidate entries as they change (see
+# webhooks.py). Project details, ref lookups, trees and group project lists
+# are dropped by push, merge request, project and membership events, so they
+# can live far longer than polling would allow. Note that ``*`` also matches
+# ``/``, so the catch-all ``/projects/*/*`` keeps other project sub-resources
+# on the short default.
+WEBHOOK_TTLS = {
+    '/user': 0,
+    '/projects': 300,
+    '/groups': 300,
+    '/groups/*/projects': 3600,
+    '/projects/*/repository/tree': 86400,
+    '/projects/*/repository/commits': 3600,
+    '/projects/*/merge_requests': 3600,
+    '/projects/*/*': 120,
+    '/projects/*': 3600,
+}
+
+
+def token_fingerprint(headers):
+    """Return a short, non-reversible fingerprint of the credentials in ``headers``."""
+    headers = CaseInsensitiveDict(headers or {})
+    secret = headers.get('Authorization') or headers.get('PRIVATE-TOKEN') or ''
+    return hashlib.sha256(secret.encode()).hexdigest()[:16]
+
+
+class CacheEntry:
+    """A stored 200 response plus the validators needed to revalidate it."""
+
+    __slots__ = ('key', 'path', 'content', 'headers', 'links', 'expires_at', '_decoded')
+
+    def __init__(self, key, path, response, ttl):
+        self.key = key
+        self.path = path
+        self.content = response.content
+        self.headers = CaseInsensitiveDict(response.headers)
+        self.links = response.links
+        self.expires_at = time.monotonic() + ttl
+        self._decoded = {}
+
+    @property
+    def etag(self):
+        return self.headers.get('ETag')
+
+    @property
+    def last_modified(self):
+        return self.headers.get('Last-Modified')
+
+    def is_fresh(self):
+        return time.monotonic() < self.expires_at
+
+    def decoded(self, decoder=None):
+        """Decode the body once and reuse the result for every later hit.
+
+        Decoding with a ``decoder`` keeps only its compact result and drops
+        the body, which revalidation does not need. The entry can then only
+        be read in that shape.
+        """
+        try:
+            return self._decoded[decoder]
+        except KeyError:
+            pass
+        content = self.content
+        if content is None:
+            raise LookupError(f"{self.path} is cached only in the shape of {next(iter(self._decoded))!r}")
+        data = loads(content)
+        if decoder is None:
+            self._decoded[None] = data
+            return data
+        value = decoder(data)
+        self._decoded = {decoder: value}
+        self.content = None
+        return value
+
+    def json(self):
+        return self.decoded()
+
+
+class CachedResponse:
+    """Minimal stand-in for ``requests.Response`` backed by a cache entry.
+
+    The decoded JSON (or records) is shared between hits, so callers must
+    treat it as read-only.
+    """
+
+    status_code = 200
+    ok = True
+    from_cache = True
+
+    def __init__(self, entry):
+        self._entry = entry
+        self.headers = entry.headers
+        self.links = entry.links
+        self.content = entry.content
+
+    def json(self):
+        return self._entry.decoded()
+
+    def decoded(self, decoder=None):
+        return self._entry.decoded(decoder)
+
+    def close(self):
+        pass
+
+
+class ResponseCache:
+    """LRU response cache keyed by (token fingerprint, URL, params).
+
+    Fresh entries are served with no request at all. Stale entries are
+    revalidated with ``If-None-Match``/``If-Modified-Since`` so an unchanged
+    resource costs a bodiless 304.
+    """
+
+    def __init__(self, max_entries=2048, ttls=None, default_ttl=0):
+        self.max_entries = max_entries
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    def key(self, url, headers, params):
+        """Build the cache key for a request."""
+        params = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+        return (token_fingerprint(headers), url, params)
+
+    def ttl_for(self, path):
+        """Return the configured TTL for an API path."""
+        for pattern, ttl in self.ttls.items():
+            if fnmatchcase(path, pattern):
+                return ttl
+        return self.default_ttl
+
+    def get(self, key):
+        """Return the entry for ``key``, marking it most recently used."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def conditional_headers(self, entry):
+        """Return the validator headers for revalidating ``entry``."""
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def store(self, key, path, response):
+        """Cache a 200 response and return the entry."""
+        entry = CacheEntry(key, path, response, self.ttl_for(path))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def refresh(self, entry, response):
+        """Extend a revalidated entry's lifetime after a 304."""
+        for name in ('ETag', 'Last-Modified'):
+            if name in response.headers:
+                entry.headers[name] = response.headers[name]
+        entry.expires_at = time.monotonic() + self.ttl_for(entry.path)
+
+    def record(self, outcome):
+        """Count a cache outcome: ``hit``, ``miss`` or ``revalidated``."""
+        with self._lock:
+            if outcome == 'hit':
+                self.hits += 1
+            elif outcome == 'revalidated':
+                self.revalidations += 1
+            else:
+                self.misses += 1
+
+    def invalidate(self, patterns, fingerprints=None):
+        """Drop entries whose API path matches any of ``patterns``.
+
+        ``fingerprints`` limits the drop to the listed tokens' entries.
+        Returns the number of entries removed.
+        """
+        if isinstance(patterns, str):
+            patterns = (patterns,)
+        with self._lock:
+            doomed = [
+                key for key, entry in self._entries.items()
+                if (fingerprints is None or key[0] in fingerprints)
+                and any(fnmatchcase(entry.path, pattern) for pattern in patterns)
+            ]
+            for key in doomed:
+                del self._entries[key]
+        return len(doomed)
+
+    def clear(self):
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return the cache counters and current size."""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'revalidations': self.revalidations,
+                'evictions': self.evictions,
+            }
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def api_path(url, base_url):
+    """Return the API path of ``url`` relative to ``base_url``."""
+    path = urlsplit(url).path
+    base_path = urlsplit(base_url).path.rstrip('/')
+    if base_path and path.startswith(base_path):
+        path = path[len(base_path):]
+    return path or '/'
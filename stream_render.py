@@ -0,0 +1,125 @@
+"""Helpers for rendering pages progressively with Flask's ``stream_template``."""
+import contextvars
+import itertools
+import queue
+import threading
+
+_DONE = object()
+
+
+class PageFeed:
+    """Fetches a listing in the background and hands it to a template one page at a time.
+
+    At most ``max_buffered`` pages wait in memory, so a listing of any size
+    renders in constant space. If a page takes longer than ``timeout`` or the
+    listing fails, iteration stops early and ``failed`` is set so the
+    template can say the list is incomplete.
+
+    Each feed fetches on its own thread rather than a shared pool: a slow
+    client keeps its feed waiting for as long as it reads, which would
+    otherwise tie up workers other requests need. The thread starts when
+    the template first reads the feed, so a response whose body is never
+    produced (a HEAD request, a client gone before the first chunk) starts
+    none.
+    """
+
+    def __init__(self, records, page_size=100, timeout=None, max_buffered=2):
+        self.timeout = timeout
+        self.failed = False
+        self.count = 0
+        self._queue = queue.Queue(maxsize=max_buffered)
+        self._closed = False
+        # Run in a copy of the request's context so upstream timings are attributed to it
+        self._thread = threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(self._fill, records, page_size),
+            name='page-feed',
+            daemon=True
+        )
+
+    def _start(self):
+        if self._thread is not None:
+            thread, self._thread = self._thread, None
+            if not self._closed:
+                thread.start()
+
+    def _fill(self, records, page_size):
+        try:
+            while not self._closed:
+                page = list(itertools.islice(records, page_size))
+                if not page:
+                    break
+                self._put(page)
+        except Exception:
+            self.failed = True
+        finally:
+            self._put(_DONE)
+
+    def _put(self, item):
+        # Poll so a reader that went away (client disconnect) frees the worker
+        while not self._closed:
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def ready(self):
+        """Return True if the next page can be read without waiting."""
+        self._start()
+        return not self._queue.empty()
+
+    def close(self):
+        """Stop fetching; safe to call more than once."""
+        self._closed = True
+
+    def __iter__(self):
+        self._start()
+        while True:
+            try:
+                page = self._queue.get(timeout=self.timeout)
+            except queue.Empty:
+                self.failed = True
+                self.close()
+                return
+            if page is _DONE:
+                return
+            self.count += len(page)
+            yield page
+
+
+class ChunkedStream:
+    """Joins template output into reasonably sized chunks.
+
+    Templates call ``flush_before(feed)`` right before reading from a
+    ``PageFeed``. If that feed has no page ready, everything rendered so far
+    is sent at once rather than held back while the next page loads.
+    Otherwise output is sent whenever ``min_chunk`` characters have built up.
+    """
+
+    def __init__(self, feeds, min_chunk=16384):
+        self.feeds = feeds
+        self.min_chunk = min_chunk
+        self._pending = None
+
+    def flush_before(self, feed):
+        self._pending = feed
+        return ''
+
+    def chunks(self, pieces):
+        buffer = []
+        size = 0
+        try:
+            for piece in pieces:
+                buffer.append(piece)
+                size += len(piece)
+                feed, self._pending = self._pending, None
+                if size >= self.min_chunk or (feed is not None and not feed.ready()):
+                    yield ''.join(buffer)
+                    buffer = []
+                    size = 0
+            if buffer:
+                yield ''.join(buffer)
+        finally:
+            for feed in self.feeds:
+                feed.close()
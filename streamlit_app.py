@@ -1,7 +1,14 @@
 import streamlit as st
-import requests
+import itertools
 import json
+import os
 import pandas as pd
+import requests
+
+from bulk_issues import ISSUE_FIELDS, KEY_COLUMN, create_issues, read_upload, validate
+from gitlab_client import GitLabClient
+from records import CommitRecord
+from response_cache import token_fingerprint
 
 st.set_page_config(page_title="GitLab API Explorer", layout="wide")
 
@@ -26,18 +33,24 @@ else:
         PRIVATE_PROJECT_ID = 0
 
 # API Settings
-GITLAB_API = "https://gitlab.com/api/v4"
+GITLAB_API = os.getenv("GITLAB_API_URL", "https://gitlab.com/api/v4")
 HEADERS = {"Authorization": f"Bearer {GITLAB_TOKEN}"}
 
+@st.cache_resource
+def get_gitlab_client():
+    """Return the pooled GitLab client shared across reruns and sessions"""
+    return GitLabClient(GITLAB_API)
+
 def make_api_request(endpoint, method="GET", data=None, params=None):
     """Make a request to the GitLab API and return the response"""
     url = f"{GITLAB_API}{endpoint}"
     with st.spinner(f"Making {method} request to {url}"):
         try:
+            client = get_gitlab_client()
             if method == "GET":
-                response = requests.get(url, headers=HEADERS, params=params)
+                response = client.get(endpoint, headers=HEADERS, params=params)
             elif method == "POST":
-                response = requests.post(url, headers=HEADERS, json=data)
+                response = client.post(endpoint, headers=HEADERS, json=data)
             else:
                 return {"error": f"Method {method} not supported"}
             
@@ -51,6 +64,71 @@ def make_api_request(endpoint, method="GET", data=None, params=None):
         except Exception as e:
             return {"error": str(e)}
 
+# Commit history cache settings
+COMMIT_CACHE_TTL = 300
+COMMIT_PAGE_SIZE = 100
+COMMIT_FIELDS = list(CommitRecord.__slots__)
+COMMIT_COLUMNS = {
+    "id": "SHA",
+    "short_id": "Short SHA",
+    "author_name": "Author",
+    "message": "Message",
+    "created_at": "Date"
+}
+
+@st.cache_resource
+def get_commit_store():
+    """Return the synced commit histories, kept across cache expiry so syncs can be incremental"""
+    return {}
+
+def fetch_commit_frames(project_id, ref, known=None):
+    """Yield one DataFrame per page of commits, newest first, stopping at the first SHA in known"""
+    # Topological order lists commits brought in by a merge before the older
+    # history they branched from, even when their dates are older
+    params = {"order": "topo"}
+    if ref:
+        params["ref_name"] = ref
+    client = get_gitlab_client()
+    # A sync usually stops on the first page, so only a full load fetches pages in parallel
+    paginate = client.paginate if known else client.paginate_parallel
+    records = paginate(
+        f"/projects/{project_id}/repository/commits",
+        headers=HEADERS,
+        params=params,
+        per_page=COMMIT_PAGE_SIZE,
+        strict=True,
+        decoder=CommitRecord.decode
+    )
+    while True:
+        page = list(itertools.islice(records, COMMIT_PAGE_SIZE))
+        if not page:
+            return
+        new = list(itertools.takewhile(lambda commit: commit.id not in known, page)) if known else page
+        if new:
+            yield pd.DataFrame.from_records([commit.astuple() for commit in new], columns=COMMIT_FIELDS)
+        if len(new) < len(page):
+            return
+
+@st.cache_data(ttl=COMMIT_CACHE_TTL, show_spinner="Syncing commit history...")
+def load_commit_history(token_key, project_id, ref):
+    """Return the full commit history for a ref, pulling only commits added since the last sync"""
+    store = get_commit_store()
+    key = (token_key, project_id, ref)
+    history = store.get(key)
+    known = None
+    if history is not None and not history.empty:
+        known = set(history["id"])
+
+    frames = list(fetch_commit_frames(project_id, ref, known))
+    if history is not None:
+        frames.append(history)
+    if frames:
+        history = pd.concat(frames, ignore_index=True).drop_duplicates("id")
+    else:
+        history = pd.DataFrame(columns=COMMIT_FIELDS)
+    store[key] = history
+    return history[list(COMMIT_COLUMNS)].rename(columns=COMMIT_COLUMNS)
+
 def display_response(response):
     """Display API response in a formatted way"""
     if isinstance(response, dict) and "error" in response:
@@ -201,6 +279,57 @@ description="{description}"''')
         response = make_api_request(f"/projects/{project_id}/issues", method="POST", data=data)
         display_response(response)
 
+    st.markdown("---")
+    st.subheader("Bulk Create from a File")
+    st.write(
+        f"Upload a CSV or a JSON list of objects with the columns {', '.join(ISSUE_FIELDS)} "
+        f"(only `title` is required) and an optional `{KEY_COLUMN}`. Each issue is tagged with its "
+        "key, so uploading the same file again only creates the issues that are still missing."
+    )
+    uploaded = st.file_uploader("Issues file", type=["csv", "json"])
+    col1, col2 = st.columns(2)
+    with col1:
+        concurrency = st.number_input("Concurrent requests", min_value=1, max_value=16, value=4)
+    with col2:
+        rate = st.number_input("Max issues per second", min_value=0.5, max_value=20.0, value=5.0, step=0.5)
+
+    if uploaded is not None:
+        try:
+            frame = read_upload(uploaded.name, uploaded.getvalue())
+        except (ValueError, pd.errors.ParserError) as e:
+            display_response({"error": f"Could not read {uploaded.name}: {e}"})
+        else:
+            issues, errors = validate(frame)
+            if errors:
+                st.error(f"{len(errors)} problems found; fix them and upload the file again")
+                st.dataframe(pd.DataFrame(errors, columns=["Row", "Problem"]), hide_index=True)
+            elif not issues:
+                st.info("The file has no rows")
+            elif st.button(f"Create {len(issues)} Issues"):
+                progress = st.progress(0.0, text="Checking for issues created by earlier runs...")
+                live_table = st.empty()
+                results = []
+                counts = {}
+                try:
+                    for result in create_issues(get_gitlab_client(), HEADERS, project_id, issues,
+                                                concurrency=int(concurrency), rate=rate):
+                        results.append(result)
+                        counts[result["status"]] = counts.get(result["status"], 0) + 1
+                        progress.progress(
+                            len(results) / len(issues),
+                            text=f"{len(results)}/{len(issues)} rows: "
+                                 + ", ".join(f"{count} {status}" for status, count in counts.items())
+                        )
+                        if len(results) % 10 == 0:
+                            live_table.dataframe(pd.DataFrame(results[-10:]), hide_index=True)
+                except requests.RequestException as e:
+                    display_response({"error": f"Could not check existing issues: {e}"})
+                if results:
+                    results_df = pd.DataFrame(results).sort_values("row")
+                    live_table.dataframe(results_df, hide_index=True)
+                    st.download_button("Download Results", results_df.to_csv(index=False),
+                                       file_name="bulk_issue_results.csv", mime="text/csv")
+
 elif test_case == "List Merge Requests":
     st.header("List Merge Requests")
     project_id = st.selectbox("Select Project", [PUBLIC_PROJECT_ID, PRIVATE_PROJECT_ID])
@@ -223,22 +352,35 @@ elif test_case == "Get Commit Details":
     
     if not commit_sha:
         st.info("First, let's find a commit SHA to use")
-        if st.button("List Recent Commits"):
-            response = make_api_request(f"/projects/{project_id}/repository/commits")
-            if isinstance(response, list) and len(response) > 0:
-                commits_df = pd.DataFrame([
-                    {
-                        "SHA": commit["id"],
-                        "Short SHA": commit["short_id"],
-                        "Author": commit["author_name"],
-                        "Message": commit["message"],
-                        "Date": commit["created_at"]
-                    }
-                    for commit in response
-                ])
-                st.dataframe(commits_df)
+        ref = st.text_input("Branch or tag (leave empty for the default branch)", value="")
+        token_key = token_fingerprint(HEADERS)
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            list_commits = st.button("List Recent Commits")
+        with col2:
+            if st.button("Sync New Commits",
+                         help="Fetches commits down to the newest one already loaded. "
+                              "Use Reload Full History after a force-push."):
+                load_commit_history.clear()
+                list_commits = True
+        with col3:
+            if st.button("Reload Full History"):
+                get_commit_store().pop((token_key, project_id, ref), None)
+                load_commit_history.clear()
+                list_commits = True
+
+        if list_commits:
+            try:
+                commits_df = load_commit_history(token_key, project_id, ref)
+            except requests.RequestException as e:
+                display_response({"error": str(e)})
             else:
-                display_response(response)
+                if commits_df.empty:
+                    st.info("No commits found")
+                else:
+                    st.caption(f"{len(commits_df)} commits")
+                    st.dataframe(commits_df)
     else:
         col1, col2 = st.columns(2)
         with col1:
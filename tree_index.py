@@ -0,0 +1,234 @@
+"""Recursive repository tree index, immutable per commit SHA."""
+import contextvars
+import re
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+
+from metrics import decode_json
+from records import TreeEntry
+
+COMMIT_SHA_RE = re.compile(r'^[0-9a-f]{40}$')
+
+
+def tree_rows(entries):
+    """Decoder for tree listings: keep each entry as a ``(path, type, id, mode)`` tuple."""
+    return [(entry['path'], entry['type'], entry['id'], entry['mode']) for entry in entries]
+
+
+class TreeIndex:
+    """Compact, read-only index of every entry in a repository at one commit.
+
+    Entries are stored column-wise in tuples sorted by path, so a subtree is
+    a contiguous slice found by bisection.
+    """
+
+    __slots__ = ('sha', 'paths', 'types', 'ids', 'modes')
+
+    def __init__(self, sha, entries):
+        entries = sorted(entries)
+        self.sha = sha
+        self.paths = tuple(entry[0] for entry in entries)
+        self.types = tuple(entry[1] for entry in entries)
+        self.ids = tuple(entry[2] for entry in entries)
+        self.modes = tuple(entry[3] for entry in entries)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def subtree(self, path):
+        """Return the ``(path, type, id, mode)`` rows below directory ``path``."""
+        if not path:
+            start, stop = 0, len(self.paths)
+        else:
+            start = bisect_left(self.paths, path + '/')
+            stop = bisect_left(self.paths, path + '0')  # '0' sorts right after '/'
+        return list(zip(self.paths[start:stop], self.types[start:stop],
+                        self.ids[start:stop], self.modes[start:stop]))
+
+    def entries(self, path=''):
+        """Return the direct children of ``path`` as ``TreeEntry`` records."""
+        depth = path.count('/') + 1 if path else 0
+        return [
+            TreeEntry(entry_id, entry_path.rsplit('/', 1)[-1], entry_type, entry_path, mode)
+            for entry_path, entry_type, entry_id, mode in self.subtree(path)
+            if entry_path.count('/') == depth
+        ]
+
+    def tree_ids(self):
+        """Return a mapping of directory path to git tree ID."""
+        return {
+            path: entry_id
+            for path, entry_type, entry_id in zip(self.paths, self.types, self.ids)
+            if entry_type == 'tree'
+        }
+
+    def blobs(self):
+        """Yield ``(path, blob_id)`` for every file."""
+        for path, entry_type, entry_id in zip(self.paths, self.types, self.ids):
+            if entry_type == 'blob':
+                yield path, entry_id
+
+
+class TreeIndexer:
+    """Builds and caches ``TreeIndex`` objects for a ``GitLabClient``.
+
+    An index for a SHA that has already been built is returned without any
+    API call. When a project moves to a new SHA, only directories whose tree
+    ID changed since the previous index are listed again.
+    """
+
+    def __init__(self, client, max_indexes=64, max_workers=8):
+        self.client = client
+        self.max_indexes = max_indexes
+        self.max_workers = max_workers
+        self._indexes = OrderedDict()
+        # project_id -> SHA of its newest index, which incremental builds start
+        # from; dropped with that index so this stays within max_indexes
+        self._latest = {}
+        # (project_id, sha) -> Future for builds in progress, so concurrent
+        # requests for the same commit wait for one build instead of each listing the tree
+        self._building = {}
+        self._lock = threading.Lock()
+
+    def resolve_ref(self, project_id, ref=None, headers=None):
+        """Return the commit SHA ``ref`` points to, or the default branch head."""
+        if ref and COMMIT_SHA_RE.match(ref):
+            return ref
+        params = {'per_page': 1}
+        if ref:
+            params['ref_name'] = ref
+        response = self.client.get(
+            f"/projects/{project_id}/repository/commits",
+            headers=headers,
+            params=params
+        )
+        if response.status_code != 200:
+            return None
+        commits = decode_json(response)
+        return commits[0]['id'] if commits else None
+
+    def get_index(self, project_id, ref=None, headers=None):
+        """Return the ``TreeIndex`` for ``ref``, building it if needed."""
+        sha = self.resolve_ref(project_id, ref, headers)
+        if sha is None:
+            return None
+        key = (project_id, sha)
+        waited = False
+        while True:
+            with self._lock:
+                index = self._indexes.get(key)
+                if index is not None:
+                    self._indexes.move_to_end(key)
+                    return index
+                building = self._building.get(key)
+                if building is None:
+                    building = self._building[key] = Future()
+                    previous = self._indexes.get((project_id, self._latest.get(project_id)))
+                    break
+            index = building.result()
+            # A failed build may only have hit its own caller's deadline; retry once
+            if index is not None or waited:
+                return index
+            waited = True
+
+        try:
+            index = self._build(project_id, sha, previous, headers)
+        except BaseException as e:
+            with self._lock:
+                del self._building[key]
+            building.set_exception(e)
+            raise
+        with self._lock:
+            if index is not None:
+                self._indexes[key] = index
+                self._latest[project_id] = sha
+                while len(self._indexes) > self.max_indexes:
+                    (evicted_project, evicted_sha), _ = self._indexes.popitem(last=False)
+                    if self._latest.get(evicted_project) == evicted_sha:
+                        # Its next build lists the whole tree again
+                        del self._latest[evicted_project]
+            del self._building[key]
+        building.set_result(index)
+        return index
+
+    def _build(self, project_id, sha, previous, headers):
+        if previous is not None:
+            entries = self._walk_changed(project_id, sha, previous, headers)
+        else:
+            entries = self._list_recursive(project_id, sha, headers)
+        if entries is None:
+            return None
+        return TreeIndex(sha, entries)
+
+    def mark_stale(self, project_id):
+        """Forget which commits a project's refs point to, e.g. after a push.
+
+        Indexes are immutable per SHA, so they stay cached; the next lookup
+        resolves the ref again and, if it moved, rebuilds incrementally from
+        the latest index.
+        """
+        if self.client.cache is None:
+            return 0
+        return self.client.cache.invalidate(f"/projects/{project_id}/repository/commits")
+
+    def invalidate(self, project_id):
+        """Forget every index for a project."""
+        with self._lock:
+            self._latest.pop(project_id, None)
+            for key in [key for key in self._indexes if key[0] == project_id]:
+                del self._indexes[key]
+
+    def _list(self, project_id, sha, headers, path='', recursive=False):
+        """List a tree through keyset pagination; None if the listing fails."""
+        params = {'ref': sha, 'pagination': 'keyset'}
+        if path:
+            params['path'] = path
+        if recursive:
+            params['recursive'] = True
+        try:
+            return list(self.client.paginate(
+                f"/projects/{project_id}/repository/tree",
+                headers=headers,
+                params=params,
+                strict=True,
+                decoder=tree_rows
+            ))
+        except requests.RequestException:
+            return None
+
+    def _list_recursive(self, project_id, sha, headers):
+        """Fetch the whole tree with one recursive paginated listing."""
+        return self._list(project_id, sha, headers, recursive=True)
+
+    def _walk_changed(self, project_id, sha, previous, headers):
+        """Rebuild from ``previous``, listing only directories whose tree ID changed."""
+        old_tree_ids = previous.tree_ids()
+        entries = []
+        level = ['']
+        with ThreadPoolExecutor(max_workers=self.max_workers,
+                                thread_name_prefix='gitlab-tree') as executor:
+            while level:
+                listings = executor.map(
+                    lambda path, context: context.run(self._list, project_id, sha, headers, path=path),
+                    level,
+                    [contextvars.copy_context() for _ in level]
+                )
+                next_level = []
+                for rows in listings:
+                    if rows is None:
+                        return None
+                    for row in rows:
+                        entries.append(row)
+                        path, entry_type, entry_id, _ = row
+                        if entry_type != 'tree':
+                            continue
+                        if old_tree_ids.get(path) == entry_id:
+                            entries.extend(previous.subtree(path))
+                        else:
+                            next_level.append(path)
+                level = next_level
+        return entries
@@ -0,0 +1,132 @@
+"""GitLab webhook handling: drop exactly the cached data an event makes stale."""
+import hmac
+
+import metrics
+
+# Member events arrive from group webhooks and system hooks with an
+# ``event_name`` instead of an ``object_kind``
+PROJECT_MEMBER_EVENTS = frozenset({
+    'user_add_to_team', 'user_remove_from_team', 'user_update_for_team',
+})
+GROUP_MEMBER_EVENTS = frozenset({
+    'user_add_to_group', 'user_remove_from_group', 'user_update_for_group',
+})
+PROJECT_EVENTS = frozenset({
+    'project_create', 'project_destroy', 'project_rename', 'project_transfer', 'project_update',
+})
+
+# Listings whose contents depend on what a user is a member of
+MEMBERSHIP_LISTINGS = ('/projects', '/groups', '/groups/*/projects')
+
+
+def verify_token(received, secret):
+    """Constant-time check of the ``X-Gitlab-Token`` header against ``secret``."""
+    if not secret or received is None:
+        return False
+    return hmac.compare_digest(received.encode(), secret.encode())
+
+
+def event_kind(payload):
+    """Return ``object_kind`` for project hooks, ``event_name`` for system and member hooks."""
+    return payload.get('object_kind') or payload.get('event_name')
+
+
+class WebhookInvalidator:
+    """Turns GitLab events into targeted cache invalidations.
+
+    A push marks the project's ref lookups stale so the tree index follows
+    the new head; merge request events drop the project's merge request
+    listings; project events drop the project and every listing it can
+    appear in; membership events drop only the affected user's listings
+    and organisation index access, forcing a full re-crawl for them.
+    """
+
+    def __init__(self, cache, tree_indexer, identity_cache, org_index=None):
+        self.cache = cache
+        self.tree_indexer = tree_indexer
+        self.identity_cache = identity_cache
+        self.org_index = org_index
+
+    def handle(self, payload):
+        """Apply one event; returns entries dropped, or None if the event is not handled."""
+        kind = event_kind(payload)
+        if kind in ('push', 'tag_push'):
+            return self._push(payload)
+        if kind == 'merge_request':
+            return self._merge_request(payload)
+        if kind in PROJECT_EVENTS:
+            return self._project(kind, payload['project_id'])
+        if kind in PROJECT_MEMBER_EVENTS or kind in GROUP_MEMBER_EVENTS:
+            return self._membership(payload)
+        return None
+
+    def _push(self, payload):
+        project_id = payload.get('project_id') or payload['project']['id']
+        # The project's last activity moved as well
+        return self.tree_indexer.mark_stale(project_id) + self.cache.invalidate(f"/projects/{project_id}")
+
+    def _merge_request(self, payload):
+        attributes = payload.get('object_attributes') or {}
+        project_id = attributes.get('target_project_id') or payload['project']['id']
+        dropped = self.cache.invalidate((
+            f"/projects/{project_id}",
+            f"/projects/{project_id}/merge_requests",
+            f"/projects/{project_id}/merge_requests/*",
+        ))
+        if attributes.get('action') == 'merge':
+            # The target branch moved; its push event may not be subscribed
+            dropped += self.tree_indexer.mark_stale(project_id)
+        return dropped
+
+    def _project(self, kind, project_id):
+        if kind in ('project_destroy', 'project_transfer'):
+            self.tree_indexer.invalidate(project_id)
+        if kind == 'project_destroy' and self.org_index is not None:
+            self.org_index.remove_project(project_id)
+        return self.cache.invalidate((
+            f"/projects/{project_id}",
+            f"/projects/{project_id}/*",
+            '/projects',
+            '/groups/*/projects',
+        ))
+
+    def _membership(self, payload):
+        fingerprints = self.identity_cache.fingerprints_for(payload['user_id'])
+        if not fingerprints:
+            return 0
+        patterns = MEMBERSHIP_LISTINGS
+        if payload.get('project_id'):
+            # The project's ``permissions`` block is per user
+            patterns += (f"/projects/{payload['project_id']}",)
+        dropped = self.cache.invalidate(patterns, fingerprints)
+        if self.org_index is not None:
+            # The index only learns about lost access on a full crawl
+            dropped += sum(self.org_index.forget(fingerprint) for fingerprint in fingerprints)
+        return dropped
+
+
+def receive(invalidator, secret, received_token, payload):
+    """Check, apply and count one webhook delivery for the ``/webhooks/gitlab`` routes.
+
+    Returns the JSON response body and its status code. ``payload`` is the
+    request's parsed JSON, or None if it was not JSON.
+    """
+    if not secret:
+        return {'error': 'webhooks are not configured'}, 404
+    if not verify_token(received_token, secret):
+        metrics.webhook_events.inc(('unknown', 'rejected'))
+        return {'error': 'invalid token'}, 401
+
+    if not isinstance(payload, dict):
+        return {'error': 'expected a JSON object'}, 400
+    kind = event_kind(payload) or 'unknown'
+    try:
+        dropped = invalidator.handle(payload)
+    except (KeyError, TypeError, AttributeError):
+        metrics.webhook_events.inc((kind, 'malformed'))
+        return {'error': f'malformed {kind} event'}, 400
+
+    # Unhandled events still get a 2xx so GitLab does not disable the hook
+    outcome = 'ignored' if dropped is None else 'handled'
+    metrics.webhook_events.inc((kind, outcome))
+    return {'event': kind, 'outcome': outcome, 'invalidated': dropped or 0}, 200